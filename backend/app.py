@@ -1,14 +1,24 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-from typing import Dict, Any, List, Tuple, Optional
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Dict, Any, FrozenSet, List, Tuple, Optional
+import asyncio
+import gzip
+import hashlib
 import networkx as nx
+import numpy as np
+import orjson
 import os
 from pyproj import Geod
-import pickle
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components, dijkstra
+from scipy.spatial import cKDTree
 from contextlib import asynccontextmanager
+from functools import lru_cache
+from operator import itemgetter
 from tree_shadows import precompute_tree_shadows, get_tree_shadow_generator
+from combine_graph_shade import load_graph
 
 import os
 
@@ -23,14 +33,59 @@ print(f"🔗 Allowed Origins: {ALLOWED_ORIGINS}")
 G: Optional[nx.Graph] = None
 geod = Geod(ellps="WGS84")
 
-# Global tree shadows variable
+# Spatial index over graph nodes, built once on startup
+NODE_KEYS: List[Tuple[float, float]] = []
+NODE_LON: Optional[np.ndarray] = None
+NODE_LAT: Optional[np.ndarray] = None
+NODE_TREE: Optional[cKDTree] = None
+NODE_LON_SCALE = 1.0  # cos(mean node latitude), shrinks longitude degrees to match latitude degrees
+GRAPH_BBOX: Optional[Tuple[float, float, float, float]] = None  # (lon_min, lat_min, lon_max, lat_max) of nodes
+OUT_OF_BOUNDS_MARGIN_M = 1000  # route endpoints farther than this outside the bbox are rejected
+METERS_PER_DEGREE_LAT = 111320
+
+# KD-tree candidates per query that are re-ranked by exact WGS84 geodesic distance
+NEAREST_NODE_CANDIDATES = 8
+
+# Edge arrays and CSR adjacency for compiled Dijkstra, built once on startup
+EDGE_U: Optional[np.ndarray] = None
+EDGE_V: Optional[np.ndarray] = None
+EDGE_WEIGHT: Optional[np.ndarray] = None
+SHADE_LENGTHS: Dict[int, np.ndarray] = {}  # hour -> shaded length (m, float32) per edge, for path statistics
+IS_SHADED: Dict[int, np.ndarray] = {}  # hour -> shaded flag (1 byte) per edge
+DEFAULT_SHADE_PENALTY = 1.0
+SHADE_FRACTION_HOURS: FrozenSet[int] = frozenset()  # hours with shade_fraction_{hour} on the edges
+HAS_SHADE = False  # 9:00 shade data present (default and fallback hour)
+EDGE_ENDPOINTS: Optional[np.ndarray] = None  # [lon1, lat1, lon2, lat2] per edge, for /graph/edges
+CSR_INDPTR: Optional[np.ndarray] = None
+CSR_INDICES: Optional[np.ndarray] = None
+CSR_EDGE_IDS: Optional[np.ndarray] = None  # edge index behind each CSR entry
+CSR_KEYS: Optional[np.ndarray] = None  # sorted row * N + col for each CSR entry
+CSR_BASE_WEIGHT: Optional[np.ndarray] = None  # edge length (m) per CSR entry
+UNSHADED_CSR: Dict[int, np.ndarray] = {}  # hour -> unshaded length (m) per CSR entry, the penalised part
+ROUTING_MATRICES: Dict[Optional[int], csr_matrix] = {}  # None -> plain lengths, hour -> default-penalty weights
+
+# Dijkstra first searches within this multiple of the straight-line distance
+# and only falls back to a wider search if the target was not reached
+ROUTE_SEARCH_DETOUR_FACTOR = 2.0
+
+# Landmarks for triangle-inequality distance bounds, built once on startup
+ROUTE_LANDMARKS = 16
+NODE_COMPONENT: Optional[np.ndarray] = None  # connected component label per node
+LANDMARK_DIST: Optional[np.ndarray] = None  # (landmarks, nodes) plain edge-length distance from each landmark
+
+# Unlimited /graph/edges payloads serialized once: name -> (json bytes, gzipped bytes, ETag)
+EDGE_EXPORTS: Dict[str, Tuple[bytes, bytes, str]] = {}
+STATIC_CACHE_CONTROL = "public, max-age=3600"
+
+# Global tree shadows variable, plus its serialized (json bytes, gzipped bytes, ETag)
 tree_shadows_geojson: Optional[Dict[str, Any]] = None
+TREE_SHADOW_EXPORT: Optional[Tuple[bytes, bytes, str]] = None
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Load the segmented graph and precompute tree shadows on startup."""
-    global G, tree_shadows_geojson
+    global G, tree_shadows_geojson, TREE_SHADOW_EXPORT
     
     # Load graph data
     enhanced_graph_path = os.path.join(os.path.dirname(__file__), "data", "graph_segments_with_shade.gpickle")
@@ -38,24 +93,35 @@ async def lifespan(app: FastAPI):
     
     try:
         if os.path.exists(enhanced_graph_path):
-            with open(enhanced_graph_path, "rb") as f:
-                G = pickle.load(f)
+            # combine_graph_shade --compress writes zstd pickles; load_graph reads either kind
+            G = load_graph(enhanced_graph_path)
             print(f"Loaded enhanced graph with {G.number_of_nodes()} nodes and {G.number_of_edges()} edges")
-            # Check if shade data is available
-            sample_edge = next(iter(G.edges(data=True)), None)
-            if sample_edge and 'shade_fraction_9' in sample_edge[2]:
-                print("✅ Shade data available for enhanced pathfinding")
-            else:
-                print("⚠️ No shade data found in enhanced graph")
         else:
-            with open(original_graph_path, "rb") as f:
-                G = pickle.load(f)
+            G = load_graph(original_graph_path)
             print(f"Loaded original graph with {G.number_of_nodes()} nodes and {G.number_of_edges()} edges")
             print("⚠️ Enhanced graph not found - shade-aware pathfinding not available")
     except Exception as e:
         print(f"Failed to load graph: {e}")
         G = None
     
+    if G is not None:
+        graph_path = enhanced_graph_path if os.path.exists(enhanced_graph_path) else original_graph_path
+        arrays = load_graph_arrays(G, graph_path)
+        build_node_index(arrays)
+        print(f"Built spatial index over {len(NODE_KEYS)} nodes")
+        build_edge_index(arrays)
+        print(f"Built routing index over {len(EDGE_WEIGHT)} edges (shade hours: {sorted(SHADE_LENGTHS)})")
+        build_landmarks()
+        if LANDMARK_DIST is not None:
+            print(f"Selected {len(LANDMARK_DIST)} routing landmarks across {NODE_COMPONENT.max() + 1} components")
+        if HAS_SHADE:
+            print("✅ Shade data available for enhanced pathfinding")
+        else:
+            print("⚠️ No shade data found in graph")
+        build_edge_exports(G)
+        print(f"Cached edge export ({len(EDGE_EXPORTS['edges'][0]) / 1e6:.1f} MB JSON, "
+              f"{len(EDGE_EXPORTS['edges'][1]) / 1e6:.1f} MB gzipped)")
+    
     # Precompute tree shadows
     tree_data_path = os.path.join(os.path.dirname(__file__), "tree_positions.json")
     try:
@@ -63,14 +129,19 @@ async def lifespan(app: FastAPI):
         tree_shadows_geojson = precompute_tree_shadows(tree_data_path)
         feature_count = len(tree_shadows_geojson.get('features', []))
         print(f"✅ Tree shadows precomputed: {feature_count} shadow polygons generated")
+        
+        # The collection never changes at runtime, so serialize and gzip it once
+        tree_shadows_geojson["properties"]["served_at"] = "runtime"
+        TREE_SHADOW_EXPORT = serialize_static_payload(tree_shadows_geojson)
     except Exception as e:
         print(f"❌ Failed to precompute tree shadows: {e}")
         tree_shadows_geojson = None
+        TREE_SHADOW_EXPORT = None
     
     yield
 
 
-app = FastAPI(title="PennApps Demo Backend", lifespan=lifespan)
+app = FastAPI(title="PennApps Demo Backend", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 if ENVIRONMENT == "production":
     # Production CORS settings
@@ -103,53 +174,374 @@ async def app_info():
     }
 
 
+def project_lonlat(lon, lat) -> np.ndarray:
+    """Equirectangular projection scaled at the graph's mean latitude.
+
+    Over a city-sized area squared Euclidean distance in this plane ranks
+    nodes like geodesic distance; the top candidates are refined exactly.
+    """
+    lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+    lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+    return np.column_stack((lon * NODE_LON_SCALE, lat))
+
+
+def extract_graph_arrays(graph: nx.Graph) -> Dict[str, np.ndarray]:
+    """Pull node coordinates, edge endpoints and routed edge attributes into flat arrays.
+
+    Returns node_lon, node_lat, edge_u, edge_v (node indices), hours and
+    fraction_hours (shade hours present), and columns: one row per attribute,
+    weight first, then shade_length_{h} and is_shaded_{h} for each hour.
+    """
+    # Node format is (lon, lat)
+    nodes = list(graph.nodes())
+    node_index = {node: i for i, node in enumerate(nodes)}
+    edges = list(graph.edges(data=True))
+    num_edges = len(edges)
+    
+    # Shade attributes are written for every edge, so the first one tells which hours exist
+    sample_attrs = edges[0][2] if edges else {}
+    hours = sorted(int(key.rsplit('_', 1)[1]) for key in sample_attrs if key.startswith('shade_length_'))
+    fraction_hours = sorted(int(key.rsplit('_', 1)[1]) for key in sample_attrs if key.startswith('shade_fraction_'))
+    
+    # Weight plus shade lengths and flags for every hour, read in a single pass over the edge dicts
+    keys = ['weight'] + [f'shade_length_{hour}' for hour in hours] + [f'is_shaded_{hour}' for hour in hours]
+    try:
+        get_attrs = itemgetter(*keys)
+        rows = [get_attrs(d) for _, _, d in edges]
+    except KeyError:
+        rows = [tuple(d.get(key, 0) for key in keys) for _, _, d in edges]
+    
+    return {
+        "node_lon": np.fromiter((lon for lon, _ in nodes), dtype=np.float64, count=len(nodes)),
+        "node_lat": np.fromiter((lat for _, lat in nodes), dtype=np.float64, count=len(nodes)),
+        "edge_u": np.fromiter((node_index[u] for u, _, _ in edges), dtype=np.int64, count=num_edges),
+        "edge_v": np.fromiter((node_index[v] for _, v, _ in edges), dtype=np.int64, count=num_edges),
+        "hours": np.array(hours, dtype=np.int64),
+        "fraction_hours": np.array(fraction_hours, dtype=np.int64),
+        # One contiguous row per attribute, so per-edge lookups and sums stay column-wise
+        "columns": np.array(rows, dtype=np.float64).reshape(num_edges, len(keys)).T.copy(),
+    }
+
+
+def load_graph_arrays(graph: nx.Graph, graph_path: str) -> Dict[str, np.ndarray]:
+    """Return the graph's flat arrays, from an .npz cache next to the pickle when it is current.
+
+    The cache records the pickle's size and mtime and is rebuilt when either changes.
+    """
+    cache_path = os.path.splitext(graph_path)[0] + "_index.npz"
+    stat = os.stat(graph_path)
+    source = np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+    
+    if os.path.exists(cache_path):
+        try:
+            with np.load(cache_path) as cached:
+                if np.array_equal(cached["source"], source):
+                    print(f"Loaded graph arrays from {os.path.basename(cache_path)}")
+                    return {key: cached[key] for key in cached.files if key != "source"}
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable graph array cache: {e}")
+    
+    arrays = extract_graph_arrays(graph)
+    try:
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, source=source, **arrays)
+        os.replace(tmp_path, cache_path)
+        print(f"Saved graph arrays to {os.path.basename(cache_path)}")
+    except OSError as e:
+        print(f"⚠️ Could not save graph array cache: {e}")
+    return arrays
+
+
+def build_node_index(arrays: Dict[str, np.ndarray]) -> None:
+    """Build the node coordinate arrays and KD-tree used for nearest-node lookups."""
+    global NODE_KEYS, NODE_LON, NODE_LAT, NODE_TREE, NODE_LON_SCALE, GRAPH_BBOX
+    
+    # Coordinates are kept as contiguous columns; NODE_KEYS holds the graph's (lon, lat) node keys
+    NODE_LON = np.ascontiguousarray(arrays["node_lon"], dtype=np.float64)
+    NODE_LAT = np.ascontiguousarray(arrays["node_lat"], dtype=np.float64)
+    NODE_KEYS = list(zip(NODE_LON.tolist(), NODE_LAT.tolist()))
+    if not NODE_KEYS:
+        NODE_TREE = None
+        return
+    NODE_LON_SCALE = float(np.cos(np.radians(NODE_LAT.mean())))
+    GRAPH_BBOX = (float(NODE_LON.min()), float(NODE_LAT.min()), float(NODE_LON.max()), float(NODE_LAT.max()))
+    NODE_TREE = cKDTree(project_lonlat(NODE_LON, NODE_LAT))
+
+
+def build_edge_index(arrays: Dict[str, np.ndarray]) -> None:
+    """Build per-edge weight arrays and the CSR adjacency used for routing."""
+    global EDGE_U, EDGE_V, EDGE_WEIGHT, SHADE_LENGTHS, IS_SHADED, EDGE_ENDPOINTS
+    global SHADE_FRACTION_HOURS, HAS_SHADE
+    global CSR_INDPTR, CSR_INDICES, CSR_EDGE_IDS, CSR_KEYS, CSR_BASE_WEIGHT, UNSHADED_CSR, ROUTING_MATRICES
+    
+    EDGE_U = arrays["edge_u"]
+    EDGE_V = arrays["edge_v"]
+    num_nodes, num_edges = len(NODE_KEYS), len(EDGE_U)
+    EDGE_ENDPOINTS = np.column_stack((NODE_LON[EDGE_U], NODE_LAT[EDGE_U], NODE_LON[EDGE_V], NODE_LAT[EDGE_V]))
+    
+    SHADE_FRACTION_HOURS = frozenset(int(hour) for hour in arrays["fraction_hours"])
+    HAS_SHADE = 9 in SHADE_FRACTION_HOURS
+    
+    hours = [int(hour) for hour in arrays["hours"]]
+    columns = arrays["columns"]
+    EDGE_WEIGHT = columns[0]
+    IS_SHADED = {hour: columns[1 + len(hours) + i] != 0 for i, hour in enumerate(hours)}
+    
+    # Path statistics only need street-scale precision, so shaded lengths are kept in float32
+    SHADE_LENGTHS = {hour: columns[1 + i].astype(np.float32) for i, hour in enumerate(hours)}
+    
+    # Undirected graph: every edge is stored once per direction, sorted by (row, col)
+    rows = np.concatenate((EDGE_U, EDGE_V))
+    cols = np.concatenate((EDGE_V, EDGE_U))
+    order = np.lexsort((cols, rows))
+    CSR_INDPTR = np.zeros(num_nodes + 1, dtype=np.int64)
+    CSR_INDPTR[1:] = np.cumsum(np.bincount(rows, minlength=num_nodes))
+    CSR_INDICES = cols[order]
+    CSR_EDGE_IDS = np.concatenate((np.arange(num_edges), np.arange(num_edges)))[order]
+    CSR_KEYS = rows[order] * num_nodes + CSR_INDICES
+    
+    # Edge lengths and per-hour unshaded lengths in CSR entry order, so weights need no gather
+    CSR_BASE_WEIGHT = EDGE_WEIGHT[CSR_EDGE_IDS]
+    UNSHADED_CSR = {hour: (EDGE_WEIGHT - columns[1 + i])[CSR_EDGE_IDS] for i, hour in enumerate(hours)}
+    
+    # Plain and default-penalty routes reuse these; only custom penalties build a matrix per request
+    ROUTING_MATRICES = {None: routing_matrix(CSR_BASE_WEIGHT)}
+    ROUTING_MATRICES.update(
+        (hour, routing_matrix(CSR_BASE_WEIGHT + unshaded * DEFAULT_SHADE_PENALTY))
+        for hour, unshaded in UNSHADED_CSR.items()
+    )
+    
+    # Memoised routes refer to node/edge indices of the previous graph
+    cached_route.cache_clear()
+
+
+def find_nearest_nodes_batch(latlngs: np.ndarray) -> Optional[np.ndarray]:
+    """Find the nearest graph node index for each [lat, lng] row.
+    
+    The KD-tree ranks by planar distance in the projected frame; its top
+    candidates are then re-ranked by geodesic distance with one vectorized
+    Geod.inv call.
+    """
+    if G is None or NODE_TREE is None:
+        return None
+    
+    points = np.asarray(latlngs, dtype=np.float64).reshape(-1, 2)
+    k = min(NEAREST_NODE_CANDIDATES, len(NODE_KEYS))
+    _, candidates = NODE_TREE.query(project_lonlat(points[:, 1], points[:, 0]), k=k)
+    candidates = candidates.reshape(len(points), k)
+    
+    # One C call for every (point, candidate) pair
+    _, _, dists = geod.inv(
+        np.repeat(points[:, 1], k), np.repeat(points[:, 0], k),
+        NODE_LON[candidates].ravel(), NODE_LAT[candidates].ravel()
+    )
+    best = np.argmin(np.asarray(dists).reshape(len(points), k), axis=1)
+    return candidates[np.arange(len(points)), best]
+
+
+def outside_graph_bounds(latlngs: np.ndarray) -> bool:
+    """True if any [lat, lng] row lies more than OUT_OF_BOUNDS_MARGIN_M outside the graph bbox."""
+    if GRAPH_BBOX is None:
+        return False
+    
+    points = np.asarray(latlngs, dtype=np.float64).reshape(-1, 2)
+    lon_min, lat_min, lon_max, lat_max = GRAPH_BBOX
+    margin_lat = OUT_OF_BOUNDS_MARGIN_M / METERS_PER_DEGREE_LAT
+    margin_lon = margin_lat / NODE_LON_SCALE
+    return bool(np.any(
+        (points[:, 0] < lat_min - margin_lat) | (points[:, 0] > lat_max + margin_lat) |
+        (points[:, 1] < lon_min - margin_lon) | (points[:, 1] > lon_max + margin_lon)
+    ))
+
+
 def find_nearest_node(lat: float, lon: float) -> Optional[Tuple[float, float]]:
-    """Find the nearest graph node to the given lat,lon using geodesic distance."""
-    if G is None:
+    """Find the nearest graph node to the given lat,lon using the prebuilt spatial index."""
+    nearest = find_nearest_nodes_batch(np.array([[lat, lon]]))
+    return NODE_KEYS[int(nearest[0])] if nearest is not None else None
+
+
+def routing_matrix(csr_weights: np.ndarray) -> csr_matrix:
+    """Symmetric CSR adjacency from weights given per CSR entry (see CSR_EDGE_IDS)."""
+    num_nodes = len(NODE_KEYS)
+    return csr_matrix((csr_weights, CSR_INDICES, CSR_INDPTR), shape=(num_nodes, num_nodes))
+
+
+def has_negative_weights(graph: csr_matrix) -> bool:
+    """SciPy's Dijkstra aborts the whole process on negative weights, so check before calling it."""
+    return graph.nnz > 0 and float(graph.data.min()) < 0
+
+
+def build_landmarks(num_landmarks: int = ROUTE_LANDMARKS) -> None:
+    """Label connected components and pick landmarks by farthest-point sampling.
+
+    Landmarks are spread over the largest component; each stores its plain
+    edge-length distance to every node.
+    """
+    global NODE_COMPONENT, LANDMARK_DIST
+    
+    # An empty graph has no components to label; routing then reports no nodes
+    if not NODE_KEYS:
+        NODE_COMPONENT = None
+        LANDMARK_DIST = None
+        return
+    
+    graph = ROUTING_MATRICES[None]
+    _, NODE_COMPONENT = connected_components(graph, directed=False)
+    main_nodes = np.flatnonzero(NODE_COMPONENT == np.argmax(np.bincount(NODE_COMPONENT)))
+    if has_negative_weights(graph):
+        print("⚠️ Graph has negative edge lengths - skipping routing landmarks")
+        LANDMARK_DIST = None
+        return
+    
+    landmark = int(main_nodes[0])
+    nearest_landmark = np.full(len(NODE_KEYS), np.inf)
+    rows = []
+    for _ in range(min(num_landmarks, len(main_nodes))):
+        dist = dijkstra(graph, directed=True, indices=landmark)
+        rows.append(dist)
+        nearest_landmark = np.minimum(nearest_landmark, dist)
+        landmark = int(main_nodes[np.argmax(nearest_landmark[main_nodes])])
+    LANDMARK_DIST = np.vstack(rows)
+
+
+def routing_graph(hour: Optional[int], shade_penalty: float) -> csr_matrix:
+    """Routing matrix for plain lengths (hour=None) or shade-aware weights at the given hour."""
+    if hour is None or shade_penalty == 0:
+        return ROUTING_MATRICES[None]
+    
+    # Fall back to 9 if the hour is not available
+    matrix_hour = hour if hour in SHADE_LENGTHS else 9
+    if shade_penalty == DEFAULT_SHADE_PENALTY and matrix_hour in ROUTING_MATRICES:
+        return ROUTING_MATRICES[matrix_hour]
+    
+    # Apply penalty: base_weight + (unshaded length × penalty_factor), in CSR entry order
+    # (no shade data: the whole edge is unshaded)
+    weights = np.multiply(UNSHADED_CSR.get(matrix_hour, CSR_BASE_WEIGHT), shade_penalty)
+    weights += CSR_BASE_WEIGHT
+    
+    # Share the plain matrix's structure arrays instead of re-validating them
+    graph = csr_matrix(ROUTING_MATRICES[None], copy=False)
+    graph.data = weights
+    return graph
+
+
+def shortest_path_indices(
+    start_idx: int, end_idx: int, graph: csr_matrix, weight_scale: float = 1.0
+) -> Optional[Tuple[List[int], float]]:
+    """Run SciPy's compiled Dijkstra and return (node index path, distance), or None if unreachable.
+
+    Args:
+        graph: Routing matrix from routing_graph / routing_matrix
+        weight_scale: Upper bound on edge weight / edge length, used to size the bounded search
+    """
+    if start_idx == end_idx:
+        return [start_idx], 0.0
+    if NODE_COMPONENT is not None and NODE_COMPONENT[start_idx] != NODE_COMPONENT[end_idx]:
         return None
+    if has_negative_weights(graph):
+        raise ValueError("Routing weights must be non-negative")
+    
+    # Routing through any landmark bounds the distance from above (triangle inequality)
+    upper_bound = np.inf
+    if LANDMARK_DIST is not None:
+        upper_bound = float(np.min(LANDMARK_DIST[:, start_idx] + LANDMARK_DIST[:, end_idx])) * weight_scale * (1 + 1e-9)
+    
+    # Distances inside the limit are exact, so a bounded search only needs a retry on a miss
+    straight_line_m = geod.inv(NODE_LON[start_idx], NODE_LAT[start_idx], NODE_LON[end_idx], NODE_LAT[end_idx])[2]
+    guess = straight_line_m * ROUTE_SEARCH_DETOUR_FACTOR * weight_scale
+    for limit in sorted({min(guess, upper_bound), upper_bound, np.inf}):
+        dist, predecessors = dijkstra(graph, directed=True, indices=start_idx, return_predecessors=True, limit=limit)
+        if np.isfinite(dist[end_idx]):
+            break
+    else:
+        return None
+    
+    path = [end_idx]
+    while path[-1] != start_idx:
+        path.append(int(predecessors[path[-1]]))
+    path.reverse()
     
-    min_dist = float('inf')
-    nearest_node = None
+    return path, float(dist[end_idx])
+
+
+@lru_cache(maxsize=4096)
+def cached_route(start_idx: int, end_idx: int, hour: Optional[int], shade_penalty: float) -> Optional[Tuple[np.ndarray, float]]:
+    """Memoised route between snapped node indices; hour=None routes on plain edge length.
     
-    for node in G.nodes():
-        # Node format is (lon, lat)
-        node_lon, node_lat = node
-        dist = geod.inv(lon, lat, node_lon, node_lat)[2]  # geodesic distance in meters
-        if dist < min_dist:
-            min_dist = dist
-            nearest_node = node
+    Callers bucket shade_penalty (2 decimals) so parameter tweaks in the UI hit the cache.
+    """
+    weight_scale = 1.0 if hour is None else 1.0 + max(shade_penalty, 0.0)
+    route = shortest_path_indices(start_idx, end_idx, routing_graph(hour, shade_penalty), weight_scale)
+    if route is None:
+        return None
+    path_indices, distance = route
     
-    return nearest_node
+    # Shared between requests, so hand out a read-only array
+    path = np.asarray(path_indices, dtype=np.int64)
+    path.flags.writeable = False
+    return path, distance
 
 
-def lonlat_to_latlng(coords: List[Tuple[float, float]]) -> List[List[float]]:
-    """Convert list of (lon, lat) tuples to [[lat, lng]] format for frontend."""
-    return [[lat, lon] for lon, lat in coords]
+def path_edge_indices(path_indices: List[int]) -> np.ndarray:
+    """Return the edge index of each hop along a node index path."""
+    path = np.asarray(path_indices, dtype=np.int64)
+    hop_keys = path[:-1] * len(NODE_KEYS) + path[1:]
+    return CSR_EDGE_IDS[np.searchsorted(CSR_KEYS, hop_keys)]
 
 
-class WeightsRequest(BaseModel):
+def path_shade_statistics(path_indices: List[int], hour: int = 9) -> Tuple[float, float, int]:
+    """Return (path length, shaded length, shaded segment count) for a path at the given hour.
+
+    Falls back to 9:00 shade data when the hour is not available.
+    """
+    edge_ids = path_edge_indices(path_indices)
+    if hour not in SHADE_LENGTHS:
+        hour = 9
+    
+    total_path_length = float(EDGE_WEIGHT[edge_ids].sum())
+    if hour not in SHADE_LENGTHS:
+        return total_path_length, 0.0, 0
+    
+    total_shade_length = float(SHADE_LENGTHS[hour][edge_ids].sum(dtype=np.float64))
+    shaded_segments = int(IS_SHADED[hour][edge_ids].sum())
+    return total_path_length, total_shade_length, shaded_segments
+
+
+def node_indices_to_latlng(indices: List[int]) -> List[List[float]]:
+    """Convert a list of node indices to [[lat, lng]] format for frontend."""
+    return np.column_stack((NODE_LAT[indices], NODE_LON[indices])).tolist()
+
+
+class RequestModel(BaseModel):
+    """Request bodies are immutable and reject unknown fields."""
+    model_config = ConfigDict(extra='forbid', frozen=True)
+
+
+class WeightsRequest(RequestModel):
     prompt: str
 
 
-class NearestNodeRequest(BaseModel):
+class NearestNodeRequest(RequestModel):
     lat: float
     lng: float
 
 
-class ShortestPathRequest(BaseModel):
+class ShortestPathRequest(RequestModel):
     start_lat: float
     start_lng: float
     end_lat: float
     end_lng: float
 
 
-class ShadeAwarePathRequest(BaseModel):
+class ShadeAwarePathRequest(RequestModel):
     start_lat: float
     start_lng: float
     end_lat: float
     end_lng: float
     time: Optional[int] = 9  # Hour 0-23, default 9am
-    shade_penalty: Optional[float] = 1.0  # Penalty factor for shaded areas
+    # Penalty factor for unshaded length; negative values would make edge weights negative
+    shade_penalty: float = Field(DEFAULT_SHADE_PENALTY, ge=0)
 
 
 @app.get("/health")
@@ -212,66 +604,55 @@ async def nearest_node(req: NearestNodeRequest) -> Dict[str, Any]:
     }
 
 
-@app.post("/shortest_path")
-async def shortest_path(req: ShortestPathRequest) -> Dict[str, Any]:
-    """Compute shortest path between start and end coordinates."""
+def compute_shortest_path(req: ShortestPathRequest) -> Dict[str, Any]:
+    """Compute shortest path between start and end coordinates (blocking)."""
     if G is None:
         return {"error": "Graph not loaded"}
     
-    # Find nearest nodes for start and end points
-    start_node = find_nearest_node(req.start_lat, req.start_lng)
-    end_node = find_nearest_node(req.end_lat, req.end_lng)
+    endpoints = np.array([
+        [req.start_lat, req.start_lng],
+        [req.end_lat, req.end_lng],
+    ])
+    if outside_graph_bounds(endpoints):
+        return JSONResponse(
+            content={"error": "Start or end point is outside the area covered by the graph"},
+            status_code=400
+        )
+    
+    # Find nearest nodes for start and end points in one lookup
+    nearest = find_nearest_nodes_batch(endpoints)
     
-    if start_node is None or end_node is None:
+    if nearest is None:
         return {"error": "Could not find nearest nodes"}
+    start_idx, end_idx = (int(i) for i in nearest)
+    start_node, end_node = NODE_KEYS[start_idx], NODE_KEYS[end_idx]
     
     try:
-        # Compute shortest path using NetworkX
-        path_nodes = nx.shortest_path(G, start_node, end_node, weight='weight')
+        # Compute shortest path using compiled Dijkstra
+        route = cached_route(start_idx, end_idx, None, 0.0)
+        if route is None:
+            return {"error": "No path found between the points"}
+        path_indices, total_distance = route
         
         # Convert path to coordinate list for frontend
-        path_coords = lonlat_to_latlng(path_nodes)
-        
-        # Calculate total distance
-        total_distance = nx.shortest_path_length(G, start_node, end_node, weight='weight')
-        
-        # Calculate shade statistics for the path (using 9am data as default)
-        total_shade_length = 0
-        total_path_length = 0
-        shaded_segments = 0
+        path_coords = node_indices_to_latlng(path_indices)
         
-        # Check if shade data is available
-        sample_edge = next(iter(G.edges(data=True)), None)
-        has_shade_data = sample_edge and 'shade_fraction_9' in sample_edge[2]
-        
-        if has_shade_data:
-            for i in range(len(path_nodes) - 1):
-                node1, node2 = path_nodes[i], path_nodes[i + 1]
-                if G.has_edge(node1, node2):
-                    edge_data = G[node1][node2]
-                    total_path_length += edge_data.get('weight', 0)
-                    
-                    # Use 9am shade data as default
-                    shade_length = edge_data.get('shade_length_9', 0)
-                    total_shade_length += shade_length
-                    
-                    # Check if segment is shaded
-                    is_shaded = edge_data.get('is_shaded_9', False)
-                    if is_shaded:
-                        shaded_segments += 1
+        if HAS_SHADE:
+            # Calculate shade statistics for the path (using 9am data as default)
+            total_path_length, total_shade_length, shaded_segments = path_shade_statistics(path_indices, 9)
         
         result = {
             "path": path_coords,
             "start_node": [start_node[1], start_node[0]],  # [lat, lng]
             "end_node": [end_node[1], end_node[0]],        # [lat, lng]
             "total_distance_m": total_distance,
-            "num_segments": len(path_nodes) - 1,
+            "num_segments": len(path_indices) - 1,
             "shade_mode": "standard",
             "analysis_time": "9:00"  # Default time for standard routing
         }
         
         # Add shade statistics if available
-        if has_shade_data:
+        if HAS_SHADE:
             shade_percentage = (total_shade_length / total_path_length * 100) if total_path_length > 0 else 0
             result.update({
                 "shaded_segments": shaded_segments,
@@ -285,31 +666,12 @@ async def shortest_path(req: ShortestPathRequest) -> Dict[str, Any]:
         
         return result
         
-    except nx.NetworkXNoPath:
-        return {"error": "No path found between the points"}
     except Exception as e:
         return {"error": f"Path computation failed: {str(e)}"}
 
 
-def calculate_shade_aware_weight(edge_attrs: Dict[str, Any], shade_penalty: float, is_daylight: bool, hour: int = 9) -> float:
-    """Calculate edge weight with shade penalty applied for the specified hour."""
-    base_weight = edge_attrs.get('weight', 0)
-    
-    if not is_daylight:
-        # Night time - no shade penalty
-        return base_weight
-    
-    # Get shade length for the specified hour (fallback to 9 if hour not available)
-    shade_length_key = f'shade_length_{hour}'
-    shade_length = edge_attrs.get(shade_length_key, edge_attrs.get('shade_length_9', 0))
-    
-    # Apply penalty: base_weight + (shade_length × penalty_factor)
-    return base_weight + ((base_weight - shade_length) * shade_penalty)
-
-
-@app.post("/shortest_path_shade")
-async def shortest_path_shade_aware(req: ShadeAwarePathRequest) -> Dict[str, Any]:
-    """Compute shortest path with shade awareness for daylight hours."""
+def compute_shade_aware_path(req: ShadeAwarePathRequest) -> Dict[str, Any]:
+    """Compute shortest path with shade awareness for daylight hours (blocking)."""
     if G is None:
         return {"error": "Graph not loaded"}
     
@@ -324,78 +686,58 @@ async def shortest_path_shade_aware(req: ShadeAwarePathRequest) -> Dict[str, Any
             end_lat=req.end_lat,
             end_lng=req.end_lng
         )
-        result = await shortest_path(standard_req)
+        result = compute_shortest_path(standard_req)
         if isinstance(result, dict) and 'path' in result:
             result['shade_mode'] = 'night'
             result['shade_penalty_applied'] = False
         return result
     
     # Check if shade data is available for the requested hour
-    sample_edge = next(iter(G.edges(data=True)), None)
-    if not sample_edge:
+    if len(EDGE_WEIGHT) == 0:
         return {"error": "No edges available in graph"}
     
     # Check for hour-specific shade data, fallback to 9
-    shade_fraction_key = f'shade_fraction_{req.time}'
-    has_hour_data = shade_fraction_key in sample_edge[2]
-    fallback_hour_data = 'shade_fraction_9' in sample_edge[2]
+    has_hour_data = req.time in SHADE_FRACTION_HOURS
     
-    if not has_hour_data and not fallback_hour_data:
+    if not has_hour_data and not HAS_SHADE:
         return {"error": f"Shade data not available for {req.time}:00 or fallback 9:00 - use /shortest_path instead"}
     
     if not has_hour_data:
         print(f"Warning: No shade data for {req.time}:00, using 9:00 data as fallback")
     
-    # Find nearest nodes for start and end points
-    start_node = find_nearest_node(req.start_lat, req.start_lng)
-    end_node = find_nearest_node(req.end_lat, req.end_lng)
+    endpoints = np.array([
+        [req.start_lat, req.start_lng],
+        [req.end_lat, req.end_lng],
+    ])
+    if outside_graph_bounds(endpoints):
+        return JSONResponse(
+            content={"error": "Start or end point is outside the area covered by the graph"},
+            status_code=400
+        )
+    
+    # Find nearest nodes for start and end points in one lookup
+    nearest = find_nearest_nodes_batch(endpoints)
     
-    if start_node is None or end_node is None:
+    if nearest is None:
         return {"error": "Could not find nearest nodes"}
+    start_idx, end_idx = (int(i) for i in nearest)
+    start_node, end_node = NODE_KEYS[start_idx], NODE_KEYS[end_idx]
     
     try:
-        # Create a temporary graph with shade-aware weights
-        temp_graph = G.copy()
-        is_daylight = True  # We already checked for night time above
-        
-        # Update edge weights with shade penalty for the specified hour
-        for node1, node2, edge_attrs in temp_graph.edges(data=True):
-            new_weight = calculate_shade_aware_weight(edge_attrs, req.shade_penalty, is_daylight, req.time)
-            edge_attrs['shade_aware_weight'] = new_weight
-        
-        # Compute shortest path using shade-aware weights
-        path_nodes = nx.shortest_path(temp_graph, start_node, end_node, weight='shade_aware_weight')
+        # Compute shortest path using shade-aware weights (night time was handled above)
+        route = cached_route(start_idx, end_idx, req.time, round(req.shade_penalty, 2))
+        if route is None:
+            return {"error": "No path found between the points"}
+        path_indices, shade_aware_distance = route
         
         # Convert path to coordinate list for frontend
-        path_coords = lonlat_to_latlng(path_nodes)
+        path_coords = node_indices_to_latlng(path_indices)
         
-        # Calculate distances using both original and shade-aware weights
-        original_distance = nx.shortest_path_length(G, start_node, end_node, weight='weight')
-        shade_aware_distance = nx.shortest_path_length(temp_graph, start_node, end_node, weight='shade_aware_weight')
+        # Calculate the unpenalized shortest distance for comparison
+        _, original_distance = cached_route(start_idx, end_idx, None, 0.0)
         
         # Calculate shade statistics for the path using hour-specific data
-        total_shade_length = 0
-        total_path_length = 0
-        shaded_segments = 0
-        
-        # Define hour-specific keys
-        shade_length_key = f'shade_length_{req.time}'
-        is_shaded_key = f'is_shaded_{req.time}'
-        
-        for i in range(len(path_nodes) - 1):
-            node1, node2 = path_nodes[i], path_nodes[i + 1]
-            if temp_graph.has_edge(node1, node2):
-                edge_data = temp_graph[node1][node2]
-                total_path_length += edge_data.get('weight', 0)
-                
-                # Try hour-specific data, fallback to 9
-                shade_length = edge_data.get(shade_length_key, edge_data.get('shade_length_9', 0))
-                total_shade_length += shade_length
-                
-                # Check if segment is shaded at this hour
-                is_shaded = edge_data.get(is_shaded_key, edge_data.get('is_shaded_9', False))
-                if is_shaded:
-                    shaded_segments += 1
+        total_path_length, total_shade_length, shaded_segments = path_shade_statistics(path_indices, req.time)
         
         shade_percentage = (total_shade_length / total_path_length * 100) if total_path_length > 0 else 0
         
@@ -408,21 +750,91 @@ async def shortest_path_shade_aware(req: ShadeAwarePathRequest) -> Dict[str, Any
             "shade_penalty_applied": req.shade_penalty,
             "analysis_time": f"{req.time}:00",
             "shade_mode": "daylight",
-            "num_segments": len(path_nodes) - 1,
+            "num_segments": len(path_indices) - 1,
             "shaded_segments": shaded_segments,
             "shade_percentage": round(shade_percentage, 1),
             "total_shade_length_m": round(total_shade_length, 1),
             "shade_penalty_added_m": round(shade_aware_distance - original_distance, 1)
         }
         
-    except nx.NetworkXNoPath:
-        return {"error": "No path found between the points"}
     except Exception as e:
         return {"error": f"Shade-aware path computation failed: {str(e)}"}
 
 
+@app.post("/shortest_path")
+async def shortest_path(req: ShortestPathRequest) -> Dict[str, Any]:
+    """Compute shortest path between start and end coordinates."""
+    # Routing is CPU-bound, so keep it off the event loop
+    return await asyncio.to_thread(compute_shortest_path, req)
+
+
+@app.post("/shortest_path_shade")
+async def shortest_path_shade_aware(req: ShadeAwarePathRequest) -> Dict[str, Any]:
+    """Compute shortest path with shade awareness for daylight hours."""
+    return await asyncio.to_thread(compute_shade_aware_path, req)
+
+
+def serialize_static_payload(payload: Dict[str, Any]) -> Tuple[bytes, bytes, str]:
+    """Serialize a payload once, returning (json bytes, gzipped bytes, quoted ETag)."""
+    body = orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+    return body, gzip.compress(body), etag
+
+
+def static_json_response(request: Request, cached: Tuple[bytes, bytes, str], headers: Optional[Dict[str, str]] = None) -> Response:
+    """Serve pre-serialized JSON with ETag revalidation and gzip when the client accepts it."""
+    body, gzipped, etag = cached
+    response_headers = {"ETag": etag, "Cache-Control": STATIC_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match == "*" or etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=response_headers)
+    
+    response_headers.update(headers or {})
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        response_headers["Content-Encoding"] = "gzip"
+        return Response(content=gzipped, media_type="application/json", headers=response_headers)
+    return Response(content=body, media_type="application/json", headers=response_headers)
+
+
+def graph_edges_payload(limit: Optional[int]) -> Dict[str, Any]:
+    """Flat edge export: edges_flat[i] = [lon1, lat1, lon2, lat2] and weights[i] for edge_{i}.
+    
+    Values are NumPy arrays so orjson serializes them without building per-edge objects.
+    """
+    total_edges = len(EDGE_WEIGHT)
+    count = min(limit, total_edges) if limit is not None and limit > 0 else total_edges
+    
+    return {
+        "type": "graph_edges",
+        "count": count,
+        "total_available": total_edges,
+        "limited": limit is not None and limit < total_edges,
+        "edges_flat": EDGE_ENDPOINTS[:count],
+        "weights": EDGE_WEIGHT[:count],
+    }
+
+
+def graph_edges_download_payload(graph: nx.Graph, limit: Optional[int]) -> Dict[str, Any]:
+    """Edge export plus the file metadata included in downloads."""
+    payload = graph_edges_payload(limit)
+    payload["limit_applied"] = limit
+    payload["generated_at"] = graph.graph.get('created_at', 'unknown') if hasattr(graph, 'graph') else 'unknown'
+    return payload
+
+
+def build_edge_exports(graph: nx.Graph) -> None:
+    """Serialize the unlimited edge exports once; the graph does not change while serving."""
+    global EDGE_EXPORTS
+    
+    EDGE_EXPORTS = {
+        "edges": serialize_static_payload(graph_edges_payload(None)),
+        "download": serialize_static_payload(graph_edges_download_payload(graph, None)),
+    }
+
+
 @app.get("/graph/edges")
-async def get_graph_edges(limit: Optional[int] = None) -> Dict[str, Any]:
+async def get_graph_edges(request: Request, limit: Optional[int] = None):
     """Export all graph edges with start/end coordinates for frontend analysis.
     
     Args:
@@ -431,50 +843,17 @@ async def get_graph_edges(limit: Optional[int] = None) -> Dict[str, Any]:
     if G is None:
         return {"error": "Graph not loaded"}
     
-    edges = []
-    
     try:
-        # Iterate through all edges in the graph
-        edge_iter = G.edges(data=True)
-        
-        # Apply limit if specified
-        if limit is not None and limit > 0:
-            edge_iter = list(edge_iter)[:limit]
-        
-        for i, (node1, node2, edge_data) in enumerate(edge_iter):
-            # node1 and node2 are tuples of (lon, lat)
-            lon1, lat1 = node1
-            lon2, lat2 = node2
-            
-            # Create edge object with frontend-compatible format
-            edge = {
-                "id": f"edge_{i}",
-                "a": {"lat": lat1, "lng": lon1},
-                "b": {"lat": lat2, "lng": lon2}
-            }
-            
-            # Optionally include edge weight/distance if available
-            if 'weight' in edge_data:
-                edge["weight"] = edge_data['weight']
-            
-            edges.append(edge)
-        
-        total_edges = G.number_of_edges()
-        
-        return {
-            "type": "graph_edges",
-            "count": len(edges),
-            "total_available": total_edges,
-            "limited": limit is not None and limit < total_edges,
-            "edges": edges
-        }
+        if limit is None and "edges" in EDGE_EXPORTS:
+            return static_json_response(request, EDGE_EXPORTS["edges"])
+        return ORJSONResponse(content=graph_edges_payload(limit))
         
     except Exception as e:
         return {"error": f"Failed to export edges: {str(e)}"}
 
 
 @app.get("/graph/edges/download")
-async def download_graph_edges(limit: Optional[int] = None):
+async def download_graph_edges(request: Request, limit: Optional[int] = None):
     """Download graph edges as a JSON file.
     
     Args:
@@ -486,54 +865,17 @@ async def download_graph_edges(limit: Optional[int] = None):
             status_code=500
         )
     
-    edges = []
-    
     try:
-        # Iterate through all edges in the graph
-        edge_iter = G.edges(data=True)
-        
-        # Apply limit if specified
-        if limit is not None and limit > 0:
-            edge_iter = list(edge_iter)[:limit]
-        
-        for i, (node1, node2, edge_data) in enumerate(edge_iter):
-            # node1 and node2 are tuples of (lon, lat)
-            lon1, lat1 = node1
-            lon2, lat2 = node2
-            
-            # Create edge object with frontend-compatible format
-            edge = {
-                "id": f"edge_{i}",
-                "a": {"lat": lat1, "lng": lon1},
-                "b": {"lat": lat2, "lng": lon2}
-            }
-            
-            # Include edge weight/distance if available
-            if 'weight' in edge_data:
-                edge["weight"] = edge_data['weight']
-            
-            edges.append(edge)
-        
-        total_edges = G.number_of_edges()
-        filename = f"graph_edges{'_limited' if limit is not None and limit < total_edges else ''}.json"
-        
-        response_data = {
-            "type": "graph_edges",
-            "count": len(edges),
-            "total_available": total_edges,
-            "limited": limit is not None and limit < total_edges,
-            "limit_applied": limit,
-            "generated_at": G.graph.get('created_at', 'unknown') if hasattr(G, 'graph') else 'unknown',
-            "edges": edges
-        }
+        limited = limit is not None and limit < len(EDGE_WEIGHT)
+        filename = f"graph_edges{'_limited' if limited else ''}.json"
+        headers = {"Content-Disposition": f"attachment; filename={filename}"}
         
         # Return as downloadable JSON file
-        return JSONResponse(
-            content=response_data,
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}",
-                "Content-Type": "application/json"
-            }
+        if limit is None and "download" in EDGE_EXPORTS:
+            return static_json_response(request, EDGE_EXPORTS["download"], headers)
+        return ORJSONResponse(
+            content=graph_edges_download_payload(G, limit),
+            headers=headers
         )
         
     except Exception as e:
@@ -544,7 +886,7 @@ async def download_graph_edges(limit: Optional[int] = None):
 
 
 @app.get("/tree_shadows")
-async def get_tree_shadows() -> Dict[str, Any]:
+async def get_tree_shadows(request: Request):
     """
     Get precomputed tree shadow polygons as GeoJSON FeatureCollection.
     
@@ -552,21 +894,15 @@ async def get_tree_shadows() -> Dict[str, Any]:
         GeoJSON FeatureCollection with circular shadow polygons for trees with density >= 0.2
         Shadow radius is mapped linearly from density [0.2, 1.0] to radius [1m, 5m]
     """
-    global tree_shadows_geojson
-    
-    if tree_shadows_geojson is None:
+    if tree_shadows_geojson is None or TREE_SHADOW_EXPORT is None:
         return {"error": "Tree shadows not available - failed to precompute on startup"}
     
     try:
-        # Add runtime metadata
-        response = tree_shadows_geojson.copy()
-        response["properties"]["served_at"] = "runtime"
-        
         # Log request for debugging
-        feature_count = len(response.get('features', []))
+        feature_count = len(tree_shadows_geojson.get('features', []))
         print(f"🌳 Serving {feature_count} tree shadow polygons")
         
-        return response
+        return static_json_response(request, TREE_SHADOW_EXPORT)
         
     except Exception as e:
         print(f"❌ Error serving tree shadows: {e}")
@@ -1,6 +1,6 @@
 import os
 import json
-import math
+import numpy as np
 import osmnx as ox
 import networkx as nx
 from shapely.geometry import Point, LineString
@@ -49,26 +49,32 @@ except Exception as e:
 if G is None:
     raise RuntimeError("Failed to build graph for place")
 
-# helper: haversine in meters between lon/lat pairs
-def haversine(lon1, lat1, lon2, lat2):
+# helper: haversine in meters between lon/lat arrays, element-wise
+def haversine_vector(lon1, lat1, lon2, lat2):
     R = 6371000.0
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-    a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
-    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = np.radians(np.asarray(lon2) - np.asarray(lon1))
+    a = np.sin(dphi/2)**2 + np.cos(phi1)*np.cos(phi2)*np.sin(dlambda/2)**2
+    return R * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
 
-def length_from_coords_coords_list(coords):
-    total = 0.0
-    for i in range(len(coords) - 1):
-        lon1, lat1 = coords[i]
-        lon2, lat2 = coords[i+1]
-        total += haversine(lon1, lat1, lon2, lat2)
-    return total
+def lengths_from_coords_lists(coords_lists):
+    """Length in meters of each [[lon, lat], ...] polyline, in one vectorized pass."""
+    if not coords_lists:
+        return np.zeros(0)
+    counts = np.array([len(coords) for coords in coords_lists])
+    flat = np.array([pt for coords in coords_lists for pt in coords], dtype=np.float64).reshape(-1, 2)
+    seg = haversine_vector(flat[:-1, 0], flat[:-1, 1], flat[1:, 0], flat[1:, 1])
+    # cumulative length at each vertex; segments that bridge two polylines fall outside every span
+    cum = np.concatenate(([0.0], np.cumsum(seg)))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    ends = starts + np.maximum(counts - 1, 0)
+    return cum[ends] - cum[starts]
 
 # 2) keep only edges with geometry; serialize minimal fields and compute length if missing
 edges = []
+missing_length = []
 for u, v, k, d in G.edges(keys=True, data=True):
     geom = d.get("geometry", None)
     if geom is None:  # make straight segment
@@ -80,12 +86,12 @@ for u, v, k, d in G.edges(keys=True, data=True):
     coords_list = [[float(x), float(y)] for (x, y) in coords]
     length_val = d.get("length", None)
     if length_val is None:
-        # compute length in meters from coords
-        length_val = length_from_coords_coords_list(coords_list)
+        # computed in meters from coords for all such edges at once below
+        missing_length.append(len(edges))
     edges.append({
         "id": f"{u}-{v}-{k}",
         "u": u, "v": v,
-        "length": float(length_val),
+        "length": float(length_val) if length_val is not None else None,
         "coords": coords_list,
         # useful tags
         "highway": d.get("highway"), "surface": d.get("surface"),
@@ -93,6 +99,9 @@ for u, v, k, d in G.edges(keys=True, data=True):
         "tunnel": d.get("tunnel"), "arcade": d.get("arcade")
     })
 
+for i, length_val in zip(missing_length, lengths_from_coords_lists([edges[i]["coords"] for i in missing_length])):
+    edges[i]["length"] = float(length_val)
+
 # 3) nodes
 nodes = {n: {"id": n, "x": float(d["x"]), "y": float(d["y"]) } for n, d in G.nodes(data=True)}
 
@@ -11,14 +11,16 @@ CLI:
 
 from __future__ import annotations
 
-from typing import Dict, Iterable, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import os
 import networkx as nx
+import numpy as np
 import osmnx as ox
 from shapely.geometry import LineString, MultiLineString, base
 from pyproj import Geod
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 import pickle
 
 DEFAULT_ROAD_TAGS: Dict[str, Iterable[str]] = {
@@ -41,37 +43,40 @@ DEFAULT_ROAD_TAGS: Dict[str, Iterable[str]] = {
 }
 
 
-def _geodesic_length_m(ls: LineString, geod: Geod) -> float:
-    if ls.is_empty:
-        return 0.0
-    lons, lats = zip(*list(ls.coords))
-    return float(geod.line_length(lons, lats))
+def _round_point(p: Tuple[float, float]) -> Tuple[float, float]:
+    # Round to keep node identity stable and avoid tiny duplicates
+    return (round(p[0], 6), round(p[1], 6))
 
 
-def _add_segment_edge(
-    G: nx.Graph,
-    a: Tuple[float, float],
-    b: Tuple[float, float],
-    geod: Geod,
-    attrs: Optional[dict] = None,
-) -> None:
-    # Round to keep node identity stable and avoid tiny duplicates
-    u = (round(a[0], 6), round(a[1], 6))
-    v = (round(b[0], 6), round(b[1], 6))
-    if u == v:
-        return
+def _segment_lengths_m(segments: List[Tuple[Tuple[float, float], Tuple[float, float]]], geod: Geod) -> np.ndarray:
+    """Geodesic length of every (u, v) segment with a single batched Geod.inv call."""
+    if not segments:
+        return np.zeros(0)
+    ends = np.array(segments, dtype=np.float64).reshape(len(segments), 4)
+    _, _, dist = geod.inv(ends[:, 0], ends[:, 1], ends[:, 2], ends[:, 3])
+    return np.asarray(dist, dtype=np.float64)
 
-    if u not in G:
-        G.add_node(u, x=u[0], y=u[1])
-    if v not in G:
-        G.add_node(v, x=v[0], y=v[1])
 
-    seg = LineString([u, v])
-    length_m = _geodesic_length_m(seg, geod)
-    edge_attrs = {"weight": length_m, "geometry": seg}
-    if attrs:
-        edge_attrs.update(attrs)
-    G.add_edge(u, v, **edge_attrs)
+def _add_segment_edges(
+    G: nx.Graph,
+    pending: List[Tuple[Tuple[float, float], Tuple[float, float], dict]],
+    lengths: np.ndarray,
+) -> None:
+    """Bulk-add segment nodes and edges in segment order, with x/y on nodes and geometry on edges."""
+    # dict.fromkeys keeps first-seen order, matching one-by-one insertion
+    nodes = dict.fromkeys(p for u, v, _ in pending for p in (u, v))
+    G.add_nodes_from((p, {"x": p[0], "y": p[1]}) for p in nodes)
+
+    def edge_attrs(u, v, attrs, length_m):
+        d = {"weight": length_m, "geometry": LineString([u, v])}
+        if attrs:
+            d.update(attrs)
+        return d
+
+    G.add_edges_from(
+        (u, v, edge_attrs(u, v, attrs, length_m))
+        for (u, v, attrs), length_m in zip(pending, lengths.tolist())
+    )
 
 
 def build_graph_segments(
@@ -113,6 +118,8 @@ def build_graph_segments(
     geod = Geod(ellps="WGS84")
     seg_edges = 0
     skipped = 0
+    # (u, v, attrs) per non-degenerate segment in feature order; lengths are measured in one batch
+    pending: List[Tuple[Tuple[float, float], Tuple[float, float], dict]] = []
 
     for i, (_, row) in enumerate(gdf.iterrows(), start=1):
         geom: base.BaseGeometry = row.get("geometry")
@@ -129,7 +136,9 @@ def build_graph_segments(
         def segmentize(ls: LineString):
             coords = list(ls.coords)
             for a, b in zip(coords[:-1], coords[1:]):
-                _add_segment_edge(G, a, b, geod, attrs=attr)
+                u, v = _round_point(a), _round_point(b)
+                if u != v:
+                    pending.append((u, v, attr))
                 nonlocal seg_edges
                 seg_edges += 1
 
@@ -143,9 +152,11 @@ def build_graph_segments(
             skipped += 1
 
         if i % 500 == 0:
-            print(
-                f"[build_graph_2] Processed {i} features... nodes={G.number_of_nodes()} edges={G.number_of_edges()}"
-            )
+            print(f"[build_graph_2] Processed {i} features... segments={len(pending)}")
+
+    print(f"[build_graph_2] Measuring {len(pending)} segments...")
+    lengths = _segment_lengths_m([(u, v) for u, v, _ in pending], geod)
+    _add_segment_edges(G, pending, lengths)
 
     total_len_m = sum(d.get("weight", 0.0) for _, _, d in G.edges(data=True))
     print("[build_graph_2] Build complete.")
@@ -186,32 +197,26 @@ def plot_graph_matplotlib(
     plt.figure(figsize=figsize)
     ax = plt.gca()
 
-    has_geom = any("geometry" in d for _, _, d in G.edges(data=True))
-
-    if has_geom:
-        for u, v, d in G.edges(data=True):
-            geom = d.get("geometry")
-            w = d.get("weight", 1.0)
-            lw = max(0.3, min(3.0, w / weight_scale))
-            if isinstance(geom, LineString):
-                xs, ys = geom.xy
-                ax.plot(xs, ys, color=edge_color, linewidth=lw, alpha=alpha)
-            elif isinstance(geom, MultiLineString):
-                for part in geom.geoms:
-                    xs, ys = part.xy
-                    ax.plot(xs, ys, color=edge_color, linewidth=lw, alpha=alpha)
-            else:
-                # Fallback to straight line between nodes
-                ux, uy = G.nodes[u]["x"], G.nodes[u]["y"]
-                vx, vy = G.nodes[v]["x"], G.nodes[v]["y"]
-                ax.plot([ux, vx], [uy, vy], color=edge_color, linewidth=lw, alpha=alpha)
-    else:
-        for u, v, d in G.edges(data=True):
-            ux, uy = G.nodes[u]["x"], G.nodes[u]["y"]
-            vx, vy = G.nodes[v]["x"], G.nodes[v]["y"]
-            w = d.get("weight", 1.0)
-            lw = max(0.3, min(3.0, w / weight_scale))
-            ax.plot([ux, vx], [uy, vy], color=edge_color, linewidth=lw, alpha=alpha)
+    # One LineCollection for all edges instead of a Line2D artist per edge
+    segments = []
+    widths = []
+    for u, v, d in G.edges(data=True):
+        geom = d.get("geometry")
+        w = d.get("weight", 1.0)
+        lw = max(0.3, min(3.0, w / weight_scale))
+        if isinstance(geom, LineString):
+            parts = [np.asarray(geom.coords)[:, :2]]
+        elif isinstance(geom, MultiLineString):
+            parts = [np.asarray(part.coords)[:, :2] for part in geom.geoms]
+        else:
+            # Fallback to straight line between nodes
+            parts = [np.array([[G.nodes[u]["x"], G.nodes[u]["y"]], [G.nodes[v]["x"], G.nodes[v]["y"]]])]
+        segments.extend(parts)
+        widths.extend([lw] * len(parts))
+
+    if segments:
+        ax.add_collection(LineCollection(segments, colors=edge_color, linewidths=widths, alpha=alpha))
+        ax.autoscale()
 
     # Plot nodes as dots
     try:
@@ -10,13 +10,36 @@ This script:
 """
 
 import os
+import hashlib
 import json
 import pickle
+import sys
 import networkx as nx
-from typing import Dict, Any, Optional
+import numpy as np
+from typing import Dict, List, Optional, Tuple
 import argparse
 from datetime import datetime
 
+# Try to import orjson for faster parsing of large shade analysis files
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Try to import zstandard for optional compressed graph pickles
+try:
+    import zstandard as zstd
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Large file buffers keep pickle streaming straight to/from disk in few syscalls
+PICKLE_BUFFER_SIZE = 4 * 1024 * 1024
+
+# Zstandard frame magic number, used to recognise compressed graph pickles
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
 
 def format_hour_suffix(hour: int) -> str:
     """Convert hour (0-23) to simple number suffix like '9' or '15'."""
@@ -24,91 +47,145 @@ def format_hour_suffix(hour: int) -> str:
 
 
 def load_graph(graph_path: str) -> nx.Graph:
-    """Load NetworkX graph from pickle file."""
+    """Load NetworkX graph from pickle file (plain or zstd-compressed)."""
     print(f"Loading graph from {graph_path}...")
     
-    with open(graph_path, 'rb') as f:
-        graph = pickle.load(f)
+    with open(graph_path, 'rb', buffering=PICKLE_BUFFER_SIZE) as f:
+        if f.peek(len(ZSTD_MAGIC))[:len(ZSTD_MAGIC)] == ZSTD_MAGIC:
+            if not ZSTD_AVAILABLE:
+                raise RuntimeError(f"{graph_path} is zstd-compressed but zstandard is not installed")
+            graph = pickle.load(zstd.ZstdDecompressor().stream_reader(f))
+        else:
+            graph = pickle.load(f)
     
     print(f"Loaded graph with {graph.number_of_nodes()} nodes and {graph.number_of_edges()} edges")
     return graph
 
 
-def load_shade_analysis(json_path: str) -> Dict[str, Dict[str, Any]]:
-    """Load shade analysis results from JSON file."""
+def edge_position(edge_id: str) -> Optional[int]:
+    """Return i for an 'edge_{i}' id, or None if the id has another form."""
+    prefix, _, index = edge_id.partition('_')
+    if prefix != 'edge' or not index.isdigit():
+        return None
+    return int(index)
+
+
+def load_shade_analysis(json_path: str) -> Dict[str, np.ndarray]:
+    """Load shade analysis results from JSON file.
+
+    Returns parallel arrays indexed by edge position i (from 'edge_{i}' ids): shade_fraction,
+    shaded, samples, and has_data marking which positions the analysis covered.
+    """
     print(f"Loading shade analysis from {json_path}...")
     
-    with open(json_path, 'r') as f:
-        data = json.load(f)
+    if ORJSON_AVAILABLE:
+        with open(json_path, 'rb') as f:
+            data = orjson.loads(f.read())
+    else:
+        with open(json_path, 'r') as f:
+            data = json.load(f)
+    
+    # Scatter edge results into arrays by edge position; ids without a position are skipped
+    edge_results = [(edge_position(r['id']), r) for r in data['edges']]
+    edge_results = [(i, r) for i, r in edge_results if i is not None]
+    num_positions = max((i for i, _ in edge_results), default=-1) + 1
+    positions = np.fromiter((i for i, _ in edge_results), dtype=np.int64, count=len(edge_results))
     
-    # Convert edge list to dictionary for fast lookup
-    shade_data = {}
-    for edge_result in data['edges']:
-        shade_data[edge_result['id']] = {
-            'shade_fraction': edge_result['shadePct'],
-            'shaded': edge_result['shaded'],
-            'samples': edge_result['nSamples']
-        }
+    shade_data = {
+        'shade_fraction': np.zeros(num_positions, dtype=np.float64),
+        'shaded': np.zeros(num_positions, dtype=bool),
+        'samples': np.zeros(num_positions, dtype=np.int64),
+        'has_data': np.zeros(num_positions, dtype=bool),
+    }
+    shade_data['shade_fraction'][positions] = [r['shadePct'] for _, r in edge_results]
+    shade_data['shaded'][positions] = [r['shaded'] for _, r in edge_results]
+    shade_data['samples'][positions] = [r['nSamples'] for _, r in edge_results]
+    shade_data['has_data'][positions] = True
     
-    print(f"Loaded shade data for {len(shade_data)} edges")
+    print(f"Loaded shade data for {int(shade_data['has_data'].sum())} edges")
     print(f"Analysis time: {data.get('analysisTime', 'unknown')}")
     print(f"Processing time: {data.get('processingTimeMs', 0)/1000:.1f}s")
     
     return shade_data
 
 
-def enhance_graph_with_shade(graph: nx.Graph, shade_data: Dict[str, Dict[str, Any]], hour: int) -> nx.Graph:
-    """Add hour-specific shade attributes to graph edges without overwriting existing hour data."""
+def shade_data_digest(shade_data: Dict[str, np.ndarray]) -> str:
+    """Fingerprint loaded shade arrays, so a re-run with identical data can be detected."""
+    digest = hashlib.blake2b(digest_size=16)
+    for key in ('has_data', 'shade_fraction', 'shaded', 'samples'):
+        digest.update(np.ascontiguousarray(shade_data[key]).tobytes())
+    return digest.hexdigest()
+
+
+def has_shade_hour(graph: nx.Graph, hour: int) -> bool:
+    """Check whether the graph already holds shade data for an hour, from metadata or a sample edge."""
+    if hour in graph.graph.get('shade_analysis_hours', []):
+        return True
+    sample_edge = next(iter(graph.edges(data=True)), None)
+    return sample_edge is not None and f'shade_fraction_{format_hour_suffix(hour)}' in sample_edge[2]
+
+
+def enhance_graph_with_shade(
+    graph: nx.Graph, shade_data: Dict[str, np.ndarray], hour: int, inplace: bool = True, overwrite: bool = False
+) -> nx.Graph:
+    """Add hour-specific shade attributes to graph edges without overwriting existing hour data.
+
+    Edits `graph` directly unless `inplace` is False, in which case a copy is enhanced and returned.
+    If the graph already has data for `hour`, it is left untouched unless `overwrite` is set.
+    """
     hour_suffix = format_hour_suffix(hour)
     print(f"Enhancing graph with shade data for {hour_suffix}...")
     
-    enhanced_graph = graph.copy()
-    edges_updated = 0
+    # main() saves and discards the graph, so copying every node/edge dict is only done on request
+    enhanced_graph = graph if inplace else graph.copy()
     edges_missing_shade = 0
     edges_already_have_hour_data = 0
     
-    # Define hour-specific attribute names
-    shade_fraction_attr = f'shade_fraction_{hour_suffix}'
-    shade_length_attr = f'shade_length_{hour_suffix}'
-    shade_samples_attr = f'shade_samples_{hour_suffix}'
-    is_shaded_attr = f'is_shaded_{hour_suffix}'
+    # Define hour-specific attribute names (interned, as every edge dict is keyed by them)
+    shade_fraction_attr = sys.intern(f'shade_fraction_{hour_suffix}')
+    shade_length_attr = sys.intern(f'shade_length_{hour_suffix}')
+    shade_samples_attr = sys.intern(f'shade_samples_{hour_suffix}')
+    is_shaded_attr = sys.intern(f'is_shaded_{hour_suffix}')
     
-    # Check if any edges already have this hour's data
-    sample_edge = next(iter(enhanced_graph.edges(data=True)), None)
-    if sample_edge and shade_fraction_attr in sample_edge[2]:
+    # Check if the graph already has this hour's data
+    if has_shade_hour(enhanced_graph, hour):
         print(f"⚠️  Warning: Graph already contains shade data for {hour_suffix}")
-        response = input(f"Overwrite existing {hour_suffix} data? (y/N): ").strip().lower()
-        if response != 'y':
-            print(f"Aborted: Existing {hour_suffix} data preserved")
+        if not overwrite:
+            print(f"Aborted: Existing {hour_suffix} data preserved (use overwrite to replace it)")
             return enhanced_graph
         print(f"Proceeding to overwrite {hour_suffix} data...")
     
-    # Iterate through all edges and add shade data
-    for i, (node1, node2, edge_attrs) in enumerate(enhanced_graph.edges(data=True)):
-        edge_id = f"edge_{i}"
-        
-        if edge_id in shade_data:
-            # Get shade data for this edge
-            shade_info = shade_data[edge_id]
-            shade_fraction = shade_info['shade_fraction']
-            
-            # Get edge weight (distance in meters)
-            edge_weight = edge_attrs.get('weight', 0)
-            
-            # Calculate shade length (fraction of edge that's shaded × edge length)
-            shade_length = shade_fraction * edge_weight
-            
+    # Shade arrays are indexed by edge position (edge_i is the i-th edge); fit them to the graph
+    num_edges = enhanced_graph.number_of_edges()
+    covered = min(num_edges, len(shade_data['has_data']))
+    has_shade, shade_fractions, is_shaded, sample_counts = (
+        np.zeros(num_edges, dtype=bool), np.zeros(num_edges), np.zeros(num_edges, dtype=bool),
+        np.zeros(num_edges, dtype=np.int64),
+    )
+    has_shade[:covered] = shade_data['has_data'][:covered]
+    shade_fractions[:covered] = shade_data['shade_fraction'][:covered]
+    is_shaded[:covered] = shade_data['shaded'][:covered]
+    sample_counts[:covered] = shade_data['samples'][:covered]
+    
+    # Shade length = fraction of edge that's shaded × edge length (meters), for all edges at once
+    weights = np.fromiter(
+        (weight for _, _, weight in enhanced_graph.edges(data='weight', default=0)),
+        dtype=np.float64, count=num_edges,
+    )
+    shade_lengths = shade_fractions * weights
+    edges_updated = int(has_shade.sum())
+    
+    # Write attributes back as plain Python values
+    for (_, _, edge_attrs), has_data, shade_fraction, shade_length, samples, shaded in zip(
+        enhanced_graph.edges(data=True), has_shade.tolist(), shade_fractions.tolist(), shade_lengths.tolist(),
+        sample_counts.tolist(), is_shaded.tolist(),
+    ):
+        if has_data:
             # Add hour-specific shade attributes
             edge_attrs[shade_fraction_attr] = shade_fraction
             edge_attrs[shade_length_attr] = shade_length
-            edge_attrs[shade_samples_attr] = shade_info['samples']
-            edge_attrs[is_shaded_attr] = shade_info['shaded']
-            
-            edges_updated += 1
-            
-            if edges_updated % 1000 == 0:
-                print(f"  Enhanced {edges_updated} edges...")
-                
+            edge_attrs[shade_samples_attr] = samples
+            edge_attrs[is_shaded_attr] = shaded
         else:
             # No shade data available - set defaults only if not already present
             if shade_fraction_attr not in edge_attrs:
@@ -127,8 +204,25 @@ def enhance_graph_with_shade(graph: nx.Graph, shade_data: Dict[str, Dict[str, An
         print(f"Note: {edges_already_have_hour_data} edges already had {hour_suffix} data")
     
     return enhanced_graph
-def update_graph_metadata(graph: nx.Graph, hour: int) -> None:
-    """Update graph metadata to track hour-specific shade data."""
+
+
+def shade_summary(graph: nx.Graph, hour: int) -> Tuple[int, float]:
+    """Return (shaded edge count, summed shade fraction) for one hour in a single pass over the edges."""
+    hour_suffix = format_hour_suffix(hour)
+    shade_fraction_attr = f'shade_fraction_{hour_suffix}'
+    is_shaded_attr = f'is_shaded_{hour_suffix}'
+    
+    shaded_edges = 0
+    total_shade_fraction = 0
+    for _, _, attrs in graph.edges(data=True):
+        if attrs.get(is_shaded_attr, False):
+            shaded_edges += 1
+        total_shade_fraction += attrs.get(shade_fraction_attr, 0)
+    return shaded_edges, total_shade_fraction
+
+
+def update_graph_metadata(graph: nx.Graph, hour: int, shade_digest: Optional[str] = None) -> None:
+    """Update graph metadata to track hour-specific shade data (and its fingerprint, if given)."""
     hour_suffix = format_hour_suffix(hour)
     
     if not hasattr(graph, 'graph'):
@@ -148,34 +242,78 @@ def update_graph_metadata(graph: nx.Graph, hour: int) -> None:
     # Update last enhancement time
     graph.graph['shade_last_enhanced_at'] = datetime.now().isoformat()
     graph.graph[f'shade_analysis_{hour_suffix}_added_at'] = datetime.now().isoformat()
+    if shade_digest is not None:
+        graph.graph[f'shade_hash_{hour_suffix}'] = shade_digest
     
     print(f"Updated metadata: Graph now has shade data for hours: {graph.graph['shade_analysis_hours']}")
 
 
-def save_enhanced_graph(graph: nx.Graph, output_path: str) -> None:
-    """Save enhanced graph to pickle file."""
-    print(f"Saving enhanced graph to {output_path}...")
+def save_enhanced_graph(graph: nx.Graph, output_path: str, compress: bool = False) -> None:
+    """Save enhanced graph to pickle file, optionally zstd-compressed."""
+    print(f"Saving enhanced graph to {output_path}{' (zstd)' if compress else ''}...")
     
-    with open(output_path, 'wb') as f:
-        pickle.dump(graph, f)
+    with open(output_path, 'wb', buffering=PICKLE_BUFFER_SIZE) as f:
+        if compress:
+            with zstd.ZstdCompressor(level=3, threads=-1).stream_writer(f) as writer:
+                pickle.dump(graph, writer, protocol=pickle.HIGHEST_PROTOCOL)
+        else:
+            pickle.dump(graph, f, protocol=pickle.HIGHEST_PROTOCOL)
     
     print(f"Saved enhanced graph with {graph.number_of_nodes()} nodes and {graph.number_of_edges()} edges")
 
 
+def parse_hours(spec: str) -> List[int]:
+    """Parse an hour list like '7-17' or '7,9,12-14' into sorted unique hours."""
+    hours = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if '-' in part:
+            first, last = (int(h) for h in part.split('-', 1))
+            hours.update(range(first, last + 1))
+        elif part:
+            hours.add(int(part))
+    return sorted(hours)
+
+
 def main():
     parser = argparse.ArgumentParser(description='Combine graph with hour-specific shade analysis data')
     parser.add_argument('--graph', '-g', required=True, help='Path to graph_segments.gpickle file (or existing enhanced graph)')
-    parser.add_argument('--shade', '-s', required=True, help='Path to shade analysis JSON file')
-    parser.add_argument('--hour', '-x', type=int, required=True, 
+    parser.add_argument('--shade', '-s', required=True,
+                       help='Path to shade analysis JSON file; with --hours, a template containing {hour}')
+    hour_group = parser.add_mutually_exclusive_group(required=True)
+    hour_group.add_argument('--hour', '-x', type=int,
                        help='Hour (0-23) that the shade data represents')
+    hour_group.add_argument('--hours',
+                       help="Several hours to add in one run, e.g. '7-17' or '7,9,12' (graph is loaded and saved once)")
     parser.add_argument('--output', '-o', default='data/graph_segments_with_shade.gpickle', 
                        help='Output path for enhanced graph')
+    parser.add_argument('--overwrite', action='store_true',
+                       help='Replace shade data already present for these hours')
+    parser.add_argument('--compress', action='store_true',
+                       help='Write a zstd-compressed pickle (needs zstandard; the API server detects and reads it)')
     
     args = parser.parse_args()
     
-    # Validate hour
-    if not (0 <= args.hour <= 23):
-        print(f"Error: Hour must be between 0-23, got {args.hour}")
+    if args.hours is not None:
+        try:
+            hours = parse_hours(args.hours)
+        except ValueError:
+            print(f"Error: Could not parse hours: {args.hours}")
+            return 1
+        if '{hour}' not in args.shade and len(hours) > 1:
+            print("Error: --shade must contain {hour} when adding several hours")
+            return 1
+    else:
+        hours = [args.hour]
+    
+    # Validate hours
+    for hour in hours:
+        if not (0 <= hour <= 23):
+            print(f"Error: Hour must be between 0-23, got {hour}")
+            return 1
+    
+    if args.compress and not ZSTD_AVAILABLE:
+        print("Error: --compress requires the zstandard package")
         return 1
     
     # Verify input files exist
@@ -183,9 +321,11 @@ def main():
         print(f"Error: Graph file not found: {args.graph}")
         return 1
     
-    if not os.path.exists(args.shade):
-        print(f"Error: Shade analysis file not found: {args.shade}")
-        return 1
+    shade_paths = {hour: args.shade.replace('{hour}', str(hour)) for hour in hours}
+    for shade_path in shade_paths.values():
+        if not os.path.exists(shade_path):
+            print(f"Error: Shade analysis file not found: {shade_path}")
+            return 1
     
     # Create output directory if needed
     output_dir = os.path.dirname(args.output)
@@ -193,13 +333,9 @@ def main():
         os.makedirs(output_dir)
         print(f"Created output directory: {output_dir}")
     
-    hour_suffix = format_hour_suffix(args.hour)
-    print(f"\n🕐 Processing shade data for {hour_suffix} ({args.hour}:00)")
-    
     try:
-        # Load input data
+        # Load the graph once for all hours
         graph = load_graph(args.graph)
-        shade_data = load_shade_analysis(args.shade)
         
         # Show existing shade hours if any
         if hasattr(graph, 'graph') and 'shade_analysis_hours' in graph.graph:
@@ -207,32 +343,55 @@ def main():
             existing_suffixes = [format_hour_suffix(h) for h in existing_hours]
             print(f"Existing shade data hours: {existing_suffixes}")
         
-        # Enhance graph with shade data for this specific hour
-        enhanced_graph = enhance_graph_with_shade(graph, shade_data, args.hour)
+        # Hours whose shade data is unchanged since it was added need no work (nor a write, when
+        # rewriting the input file); only changed hours may need --overwrite
+        rewrites_input = os.path.exists(args.output) and os.path.samefile(args.graph, args.output)
+        changed_hours = 0
         
-        # Update metadata
-        update_graph_metadata(enhanced_graph, args.hour)
+        enhanced_graph = graph
+        for hour in hours:
+            hour_suffix = format_hour_suffix(hour)
+            print(f"\n🕐 Processing shade data for {hour_suffix} ({hour}:00)")
+            shade_data = load_shade_analysis(shade_paths[hour])
+            shade_digest = shade_data_digest(shade_data)
+            if enhanced_graph.graph.get(f'shade_hash_{hour_suffix}') == shade_digest:
+                print(f"Shade data for {hour_suffix} is unchanged since it was added; skipping")
+                continue
+            if not args.overwrite and has_shade_hour(enhanced_graph, hour):
+                # Nothing has been written yet, so the graph files are untouched
+                print(f"Error: Graph already contains different shade data for {hour_suffix}; pass --overwrite to replace it")
+                return 1
+            
+            # Enhance graph with shade data for this specific hour
+            enhanced_graph = enhance_graph_with_shade(enhanced_graph, shade_data, hour, overwrite=args.overwrite)
+            
+            # Update metadata
+            update_graph_metadata(enhanced_graph, hour, shade_digest)
+            changed_hours += 1
         
         # Save enhanced graph
-        save_enhanced_graph(enhanced_graph, args.output)
+        saved = bool(changed_hours or args.compress or not rewrites_input)
+        if saved:
+            save_enhanced_graph(enhanced_graph, args.output, compress=args.compress)
+        else:
+            print(f"\nNo shade data changed; {args.output} left as is")
         
-        print(f"\n✅ Graph enhancement complete for {hour_suffix}!")
-        print(f"Enhanced graph saved to: {args.output}")
+        processed_suffixes = [format_hour_suffix(hour) for hour in hours]
+        print(f"\n✅ Graph enhancement complete for {', '.join(processed_suffixes)}!")
+        if saved:
+            print(f"Enhanced graph saved to: {args.output}")
         
-        # Print summary statistics for this hour
+        # Print summary statistics for each hour
         total_edges = enhanced_graph.number_of_edges()
-        shade_fraction_attr = f'shade_fraction_{hour_suffix}'
-        is_shaded_attr = f'is_shaded_{hour_suffix}'
-        
-        shaded_edges = sum(1 for _, _, attrs in enhanced_graph.edges(data=True) 
-                          if attrs.get(is_shaded_attr, False))
-        avg_shade_fraction = sum(attrs.get(shade_fraction_attr, 0) 
-                               for _, _, attrs in enhanced_graph.edges(data=True)) / total_edges
-        
-        print(f"\n📊 Shade Statistics for {hour_suffix}:")
-        print(f"  Total edges: {total_edges}")
-        print(f"  Shaded edges (≥50%): {shaded_edges} ({shaded_edges/total_edges*100:.1f}%)")
-        print(f"  Average shade fraction: {avg_shade_fraction:.3f}")
+        for hour in hours:
+            hour_suffix = format_hour_suffix(hour)
+            shaded_edges, total_shade_fraction = shade_summary(enhanced_graph, hour)
+            avg_shade_fraction = total_shade_fraction / total_edges
+            
+            print(f"\n📊 Shade Statistics for {hour_suffix}:")
+            print(f"  Total edges: {total_edges}")
+            print(f"  Shaded edges (≥50%): {shaded_edges} ({shaded_edges/total_edges*100:.1f}%)")
+            print(f"  Average shade fraction: {avg_shade_fraction:.3f}")
         
         # Show all available hours
         if 'shade_analysis_hours' in enhanced_graph.graph:
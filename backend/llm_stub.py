@@ -1,5 +1,6 @@
 # Lightweight LLM-like rule parser for demo purposes
-from typing import Dict, Any
+from functools import lru_cache
+from typing import Dict, Any, Tuple
 
 KEYWORDS = {
     "avoid_highway": ["no highway", "avoid highway", "no highways"],
@@ -8,13 +9,24 @@ KEYWORDS = {
 }
 
 
-def parse_prompt_to_weights(prompt: str) -> Dict[str, Any]:
+@lru_cache(maxsize=4096)
+def _prompt_flags(prompt: str) -> Tuple[bool, bool, bool]:
+    # Prompts repeat a lot in demos; cache the keyword matches, not the mutable weights dict
     p = prompt.lower()
+    return (
+        any(k in p for k in KEYWORDS["avoid_highway"]),
+        any(k in p for k in KEYWORDS["scenic"]),
+        any(k in p for k in KEYWORDS["flat"]),
+    )
+
+
+def parse_prompt_to_weights(prompt: str) -> Dict[str, Any]:
+    avoid_highway, scenic, flat = _prompt_flags(prompt)
     weights = {"avoid_highways": False, "prefer_scenic": False, "max_elevation_gain": None}
-    if any(k in p for k in KEYWORDS["avoid_highway"]):
+    if avoid_highway:
         weights["avoid_highways"] = True
-    if any(k in p for k in KEYWORDS["scenic"]):
+    if scenic:
         weights["prefer_scenic"] = True
-    if any(k in p for k in KEYWORDS["flat"]):
+    if flat:
         weights["max_elevation_gain"] = 50
     return weights
@@ -2,7 +2,15 @@ import requests
 
 if __name__ == '__main__':
     url = 'http://localhost:8000/llm/weights'
-    payload = {'prompt': 'I want a scenic, flat route and avoid highways'}
-    r = requests.post(url, json=payload)
-    print(r.status_code)
-    print(r.json())
+    prompts = [
+        'I want a scenic, flat route and avoid highways',
+        'no highways please',
+        'prefer scenic streets',
+        'flat route, no hills',
+    ]
+    # One session keeps the connection alive across calls instead of reconnecting per prompt
+    with requests.Session() as session:
+        for prompt in prompts:
+            r = session.post(url, json={'prompt': prompt})
+            print(r.status_code)
+            print(r.json())
@@ -0,0 +1,20 @@
+from llm_stub import _prompt_flags, parse_prompt_to_weights
+
+if __name__ == '__main__':
+    prompt = 'I want a scenic, flat route and avoid highways'
+    _prompt_flags.cache_clear()
+
+    first = parse_prompt_to_weights(prompt)
+    hits = _prompt_flags.cache_info().hits
+    # A repeated prompt must be answered from the keyword cache
+    second = parse_prompt_to_weights(prompt)
+    print(_prompt_flags.cache_info())
+    assert _prompt_flags.cache_info().hits == hits + 1
+
+    # Each call returns its own dict, so mutating one result leaves later ones intact
+    first['avoid_highways'] = False
+    first['max_elevation_gain'] = None
+    third = parse_prompt_to_weights(prompt)
+    print(second, third)
+    assert second == third == {'avoid_highways': True, 'prefer_scenic': True, 'max_elevation_gain': 50}
+    assert second is not first
@@ -0,0 +1,17 @@
+import requests
+
+if __name__ == '__main__':
+    base = 'http://localhost:8000'
+    route = {'start_lat': 39.945, 'start_lng': -75.16, 'end_lat': 39.96, 'end_lng': -75.15, 'time': 13}
+    with requests.Session() as session:
+        # Negative penalties must be rejected up front (422), not crash the worker
+        for penalty in (-2, -0.5):
+            r = session.post(f'{base}/shortest_path_shade', json={**route, 'shade_penalty': penalty})
+            print(penalty, r.status_code)
+            assert r.status_code == 422, r.text
+        r = session.get(f'{base}/health')
+        print(r.status_code, r.json())
+        assert r.json() == {'status': 'ok'}
+        r = session.post(f'{base}/shortest_path_shade', json={**route, 'shade_penalty': 1.5})
+        print(r.status_code, 'error' not in r.json())
+        assert 'error' not in r.json(), r.json()
@@ -1,13 +1,20 @@
 import osmnx as ox
 import geopandas as gpd
+import shapely
+from shapely.strtree import STRtree
 import pandas as pd
 import numpy as np
 import folium
 import requests
 import json
+import hashlib
+import os
+import pickle
+import time
 from datetime import datetime
 import warnings
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Tuple, Optional, Any
 
 # Try to import Google Earth Engine
@@ -22,7 +29,6 @@ except ImportError:
 # Try to import dotenv for environment variables
 try:
     from dotenv import load_dotenv
-    import os
     load_dotenv()
     DOTENV_AVAILABLE = True
 except ImportError:
@@ -30,26 +36,178 @@ except ImportError:
 
 # Try to import scipy for interpolation
 try:
-    from scipy.interpolate import griddata
+    from scipy.interpolate import RegularGridInterpolator
     SCIPY_AVAILABLE = True
 except ImportError:
     SCIPY_AVAILABLE = False
     print("SciPy not available - using simplified interpolation")
 
+# Try to import orjson for fast JSON output
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Try to import pyarrow for optional Parquet output
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Suppress warnings
-warnings.filterwarnings('ignore')
-
 # Configure OSMnx
 ox.settings.use_cache = True
 ox.settings.log_console = False
 
+# osmnx 1.3 renamed geometries_from_bbox to features_from_bbox; pick whichever exists once
+_osm_features_from_bbox = getattr(ox, 'features_from_bbox', None) or getattr(ox, 'geometries_from_bbox', None)
+
 # Downtown Philadelphia area
 PHILLY_BBOX = (39.97, 39.94, -75.15, -75.17)  # north, south, east, west
 
+# Earth Engine endpoint meant for many concurrent small requests (needs a cloud project)
+EE_HIGH_VOLUME_URL = 'https://earthengine-highvolume.googleapis.com'
+
+# Sentinel-2 band pairs of each normalized-difference vegetation index
+VEGETATION_INDEX_BANDS = {'NDVI': ('B8', 'B4'), 'NDWI': ('B3', 'B8'), 'GNDVI': ('B8', 'B3')}
+# NDWI only carries 0.2 of the interpolated score, so it is not sampled unless asked for
+DEFAULT_VEGETATION_INDICES = ('NDVI', 'GNDVI')
+# (scale, weight) of each index in the interpolated density: sum of (index - 0.1) / scale * weight
+INDEX_DENSITY_WEIGHTS = {'NDVI': (0.5, 0.6), 'NDWI': (0.3, 0.2), 'GNDVI': (0.4, 0.2)}
+
+# Enhanced detections this close to an OSM tree are treated as that same tree
+OSM_DEDUP_RADIUS = 0.00005  # degrees, ~5m (one detection grid cell)
+
+# Earth Engine sampling is split into requests of this many points, run concurrently
+EE_SAMPLE_CHUNK_SIZE = 2000
+EE_SAMPLE_WORKERS = 8
+
+# On-disk cache of OSM fetches and Earth Engine samples, keyed by bbox
+TREE_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.tree_cache')
+TREE_CACHE_TTL = 7 * 24 * 3600  # seconds
+
+
+def _nearest_grid_index(grid: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Index of the nearest grid coordinate for each value (ties go to the lower index).
+
+    Args:
+        grid: Ascending grid coordinates (as built with np.arange)
+        values: Coordinates to snap onto the grid
+    """
+    if len(grid) < 2:
+        return np.zeros(len(values), dtype=np.intp)
+    idx = np.clip(np.searchsorted(grid, values), 1, len(grid) - 1)
+    take_left = np.abs(grid[idx - 1] - values) <= np.abs(grid[idx] - values)
+    return idx - take_left
+
+
+def _tree_densities(trees_df: pd.DataFrame) -> np.ndarray:
+    """Per-tree density: the density column, else confidence, else 1.0."""
+    for column in ('density', 'confidence'):
+        if column in trees_df.columns:
+            return trees_df[column].to_numpy(dtype=float)
+    return np.ones(len(trees_df))
+
+
+def _near_trees(known_df: pd.DataFrame, candidates_df: pd.DataFrame, radius: float) -> np.ndarray:
+    """Boolean mask over candidates_df rows lying within radius (degrees) of any known tree."""
+    near = np.zeros(len(candidates_df), dtype=bool)
+    if len(known_df) == 0 or len(candidates_df) == 0:
+        return near
+    index = STRtree(shapely.points(known_df['longitude'].to_numpy(dtype=float),
+                                   known_df['latitude'].to_numpy(dtype=float)))
+    candidates = shapely.points(candidates_df['longitude'].to_numpy(dtype=float),
+                                candidates_df['latitude'].to_numpy(dtype=float))
+    candidate_idx, _ = index.query(candidates, predicate='dwithin', distance=radius)
+    near[candidate_idx] = True
+    return near
+
+
+def _add_tree_layers(m: folium.Map, trees_df: pd.DataFrame, tiers: np.ndarray,
+                     styles: List[Tuple[str, str, int]], popups: List[str]) -> None:
+    """
+    Add trees to the map as one GeoJson layer of circle markers per style tier.
+    
+    Args:
+        m: Map to add the layers to
+        trees_df: DataFrame containing tree data
+        tiers: Index into styles for every tree
+        styles: (layer name, color, radius) per tier
+        popups: Popup HTML for every tree
+    """
+    lats = trees_df['latitude'].to_numpy(dtype=float)
+    lons = trees_df['longitude'].to_numpy(dtype=float)
+    for tier, (name, color, radius) in enumerate(styles):
+        rows = np.flatnonzero(tiers == tier)
+        if len(rows) == 0:
+            continue
+        features = [
+            {
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+                'properties': {'popup': popups[k]}
+            }
+            for k, lon, lat in zip(rows.tolist(), lons[rows].tolist(), lats[rows].tolist())
+        ]
+        folium.GeoJson(
+            {'type': 'FeatureCollection', 'features': features},
+            name=name,
+            marker=folium.CircleMarker(radius=radius, color=color, fill=True, fillOpacity=0.8),
+            popup=folium.GeoJsonPopup(fields=['popup'], labels=False)
+        ).add_to(m)
+
+
+def _sampling_coords(lats: np.ndarray, lons: np.ndarray, max_points: int) -> np.ndarray:
+    """Every step-th grid cell in row-major order as (lon, lat) rows, capped at max_points."""
+    step = max(1, len(lats) * len(lons) // max_points)
+    lat_idx, lon_idx = np.meshgrid(np.arange(0, len(lats), step), np.arange(0, len(lons), step), indexing='ij')
+    return np.column_stack([lons[lon_idx.ravel()], lats[lat_idx.ravel()]])[:max_points]
+
+
+def _cache_path(kind: str, *key: Any) -> str:
+    """Cache file for one kind of fetch ('osm', 'ee') and its parameters."""
+    digest = hashlib.md5(repr(key).encode()).hexdigest()
+    return os.path.join(TREE_CACHE_DIR, f'{kind}_{digest}.pkl')
+
+
+def _load_cached(path: str) -> Optional[Any]:
+    """Return the cached object at path, or None if missing, expired or unreadable."""
+    try:
+        if time.time() - os.path.getmtime(path) > TREE_CACHE_TTL:
+            return None
+        with open(path, 'rb') as f:
+            cached = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+    logger.info(f"Loaded cached data from {path}")
+    return cached
+
+
+def _store_cached(path: str, obj: Any) -> None:
+    """Write obj to the cache; a failed write only costs the next run a refetch."""
+    tmp_path = f"{path}.tmp"
+    try:
+        os.makedirs(TREE_CACHE_DIR, exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not write cache {path}: {e}")
+
+
+def _feature_values(features: List[Dict[str, Any]], band: str, count: int) -> np.ndarray:
+    """Band values of sampled features as a float array of length count (missing or null -> 0)."""
+    values = np.zeros(count)
+    sampled = [f['properties'].get(band, 0) for f in features[:count]]
+    values[:len(sampled)] = [v if v is not None else 0 for v in sampled]
+    return values
+
 
 class OSMTreeFetcher:
     """Handles fetching tree data from OpenStreetMap."""
@@ -72,16 +230,16 @@ class OSMTreeFetcher:
             DataFrame containing OSM tree data
         """
         logger.info("Fetching OSM tree data...")
+        cache_path = _cache_path('osm', self.bbox)
+        cached = _load_cached(cache_path)
+        if cached is not None:
+            logger.info(f"Found {len(cached)} OSM trees (cached)")
+            return cached
         try:
-            # Try the new API first, fallback to old API
-            try:
-                trees_gdf = ox.features_from_bbox(
-                    self.north, self.south, self.east, self.west, 
-                    tags={'natural': 'tree'}
-                )
-            except AttributeError:
-                # Fallback to old API
-                trees_gdf = ox.geometries_from_bbox(
+            # osmnx deprecation chatter only; other warnings still surface
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', category=FutureWarning)
+                trees_gdf = _osm_features_from_bbox(
                     self.north, self.south, self.east, self.west, 
                     tags={'natural': 'tree'}
                 )
@@ -94,6 +252,7 @@ class OSMTreeFetcher:
                     'source': 'osm'
                 })
                 logger.info(f"Found {len(osm_trees)} OSM trees")
+                _store_cached(cache_path, osm_trees)
                 return osm_trees
             else:
                 logger.warning("No OSM trees found")
@@ -118,15 +277,21 @@ class OSMTreeFetcher:
 class EnhancedTreeDetector:
     """Handles enhanced tree detection using satellite imagery and multiple vegetation indices."""
     
-    def __init__(self, bbox: Tuple[float, float, float, float] = PHILLY_BBOX):
+    def __init__(self, bbox: Tuple[float, float, float, float] = PHILLY_BBOX,
+                 indices: Tuple[str, ...] = DEFAULT_VEGETATION_INDICES):
         """
         Initialize the enhanced tree detector.
         
         Args:
             bbox: Bounding box as (north, south, east, west)
+            indices: Vegetation indices to compute and sample (from VEGETATION_INDEX_BANDS)
         """
+        unknown = set(indices) - set(VEGETATION_INDEX_BANDS)
+        if unknown:
+            raise ValueError(f"Unknown vegetation indices: {sorted(unknown)}")
         self.bbox = bbox
         self.north, self.south, self.east, self.west = bbox
+        self.indices = tuple(indices)
         
     def detect_additional_trees(self) -> pd.DataFrame:
         """
@@ -154,6 +319,123 @@ class EnhancedTreeDetector:
         """Detect trees using satellite imagery."""
         logger.info("Processing with multiple detection strategies...")
         
+        # Sampled indices only depend on the bbox and grid, so reuse them across runs
+        cache_path = _cache_path('ee', self.bbox, grid_size, self.indices)
+        index_data = _load_cached(cache_path)
+        if index_data is None:
+            index_data = self._sample_indices(lats, lons)
+            if index_data is None:
+                return self._detect_with_simulation(lats, lons)
+            _store_cached(cache_path, index_data)
+        
+        # Process results with multiple strategies into scored cells (lat index, lon index, density)
+        # instead of a dense grid - only sampled cells can ever be non-zero
+        tree_threshold = 0.15
+        cell_lat_idx = cell_lon_idx = np.zeros(0, dtype=np.intp)
+        cell_density = np.zeros(0)
+        
+        if 'features' in index_data:
+            logger.info(f"Processing {len(index_data['features'])} points with multiple strategies...")
+            
+            features = index_data['features']
+            lons_arr = np.array([f['geometry']['coordinates'][0] for f in features], dtype=float)
+            lats_arr = np.array([f['geometry']['coordinates'][1] for f in features], dtype=float)
+            lat_idx = _nearest_grid_index(lats, lats_arr)
+            lon_idx = _nearest_grid_index(lons, lons_arr)
+            
+            # Get all vegetation indices (missing/null values count as 0, as before)
+            ndvi_arr = _feature_values(features, 'NDVI', len(features))
+            ndwi_arr = _feature_values(features, 'NDWI', len(features))
+            gndvi_arr = _feature_values(features, 'GNDVI', len(features))
+            
+            # Multi-strategy tree detection
+            tree_score = np.zeros(len(features))
+            
+            # Strategy 1: NDVI (vegetation health)
+            tree_score += np.where(ndvi_arr > 0.1, (ndvi_arr - 0.1) / 0.5, 0.0)
+            
+            # Strategy 2: NDWI (water content - trees have more water)
+            tree_score += np.where(ndwi_arr > 0.1, (ndwi_arr - 0.1) / 0.3, 0.0)
+            
+            # Strategy 3: GNDVI (green vegetation)
+            tree_score += np.where(gndvi_arr > 0.1, (gndvi_arr - 0.1) / 0.4, 0.0)
+            
+            # Strategy 4: Combined score with weights
+            weighted_score = np.where(ndvi_arr != 0, tree_score * 0.4 + ndvi_arr * 0.6, tree_score)
+            scored = np.flatnonzero(tree_score > 0)
+            
+            # Later points win when several land in the same cell; np.unique also sorts
+            # the cells, so trees come out in the same row-major order as a grid scan
+            cells = lat_idx[scored] * len(lons) + lon_idx[scored]
+            _, last = np.unique(cells[::-1], return_index=True)
+            scored = scored[len(scored) - 1 - last]
+            cell_lat_idx, cell_lon_idx = lat_idx[scored], lon_idx[scored]
+            cell_density = np.clip(weighted_score[scored], 0, 1)
+        
+        elif any(band in index_data for band in VEGETATION_INDEX_BANDS):
+            logger.info("Processing arrays with multi-strategy interpolation...")
+            bands = [band for band in VEGETATION_INDEX_BANDS if band in index_data]
+            band_arrays = [np.array(index_data[band]) for band in bands]
+            
+            if band_arrays[0].size > 0 and SCIPY_AVAILABLE:
+                # Interpolate all indices
+                ndvi_lats = np.linspace(self.south, self.north, band_arrays[0].shape[0])
+                ndvi_lons = np.linspace(self.west, self.east, band_arrays[0].shape[1])
+                
+                # Source arrays sit on a regular lat/lon grid, so interpolate bilinearly on it
+                # (no triangulation) and do all bands in one pass
+                index_stack = np.stack(band_arrays, axis=-1).astype(float)
+                interpolator = RegularGridInterpolator(
+                    (ndvi_lats, ndvi_lons), index_stack, method='linear', bounds_error=False, fill_value=0
+                )
+                target_lats, target_lons = np.meshgrid(lats, lons, indexing='ij')
+                index_interp = interpolator(np.stack([target_lats, target_lons], axis=-1))
+                
+                # Multi-strategy combination, (index - 0.1) / scale * weight summed over the sampled
+                # bands and clipped to [0, 1] - accumulated in place in two grid buffers
+                tree_density = np.zeros(index_interp.shape[:-1])
+                term = np.empty_like(tree_density)
+                for band, band_interp in zip(bands, np.moveaxis(index_interp, -1, 0)):
+                    scale, weight = INDEX_DENSITY_WEIGHTS[band]
+                    np.subtract(band_interp, 0.1, out=term)
+                    term /= scale
+                    term *= weight
+                    tree_density += term
+                np.clip(tree_density, 0, 1, out=tree_density)
+                cell_lat_idx, cell_lon_idx = np.nonzero(tree_density > tree_threshold)
+                cell_density = tree_density[cell_lat_idx, cell_lon_idx]
+                logger.info("✓ Multi-strategy interpolation complete")
+            else:
+                logger.warning("Array processing failed - using simulation")
+                return self._detect_with_simulation(lats, lons)
+        
+        # Convert to tree locations
+        tree_mask = cell_density > tree_threshold
+        detected_trees_lat = lats[cell_lat_idx[tree_mask]]
+        detected_trees_lon = lons[cell_lon_idx[tree_mask]]
+        detected_trees_density = cell_density[tree_mask]
+        
+        enhanced_trees_df = pd.DataFrame({
+            'latitude': detected_trees_lat,
+            'longitude': detected_trees_lon,
+            'density': detected_trees_density,
+            'source': 'satellite_enhanced_multi_strategy'
+        })
+        
+        logger.info(f"✓ Detected {len(enhanced_trees_df)} trees using satellite data")
+        logger.info(f"Grid resolution: {grid_size*111:.0f}m per cell")
+        logger.info(f"Threshold used: {tree_threshold}")
+        logger.info(f"Tree density range: {detected_trees_density.min():.3f} - {detected_trees_density.max():.3f}")
+        
+        return enhanced_trees_df
+    
+    def _sample_indices(self, lats: np.ndarray, lons: np.ndarray) -> Optional[Dict[str, Any]]:
+        """
+        Sample NDVI, NDWI and GNDVI from Earth Engine over the grid.
+        
+        Returns:
+            Sampled features (or band arrays), or None if Earth Engine is unusable
+        """
         # Initialize Earth Engine
         try:
             # Check if already initialized
@@ -164,8 +446,8 @@ class EnhancedTreeDetector:
                     project_id = os.getenv('EE_PROJECT_ID')
                 
                 if project_id:
-                    ee.Initialize(project=project_id)
-                    logger.info(f"Earth Engine initialized with project: {project_id}")
+                    ee.Initialize(project=project_id, opt_url=EE_HIGH_VOLUME_URL)
+                    logger.info(f"Earth Engine initialized with project: {project_id} (high-volume endpoint)")
                 else:
                     ee.Initialize()
                     logger.info("Earth Engine initialized without specific project")
@@ -174,7 +456,7 @@ class EnhancedTreeDetector:
         except Exception as e:
             logger.warning(f"Earth Engine initialization failed: {e}")
             logger.info("You may need to authenticate first. Run: python -c 'import ee; ee.Authenticate()'")
-            return self._detect_with_simulation(lats, lons)
+            return None
         
         # Get satellite data
         study_area = ee.Geometry.Rectangle([self.west, self.south, self.east, self.north])
@@ -183,188 +465,76 @@ class EnhancedTreeDetector:
                         .filterBounds(study_area)
                         .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 40)))
         
-        # Calculate multiple vegetation indices
+        # Calculate the configured vegetation indices only
         def calculate_vegetation_indices(image):
-            ndvi = image.normalizedDifference(['B8', 'B4']).rename('NDVI')
-            ndwi = image.normalizedDifference(['B3', 'B8']).rename('NDWI')
-            gndvi = image.normalizedDifference(['B8', 'B3']).rename('GNDVI')
-            return image.addBands(ndvi).addBands(ndwi).addBands(gndvi)
+            for name in self.indices:
+                image = image.addBands(image.normalizedDifference(list(VEGETATION_INDEX_BANDS[name])).rename(name))
+            return image
         
         # Process with multiple indices
         multi_indices = s2_collection.map(calculate_vegetation_indices)
         
-        # Get median values for each index
-        median_ndvi = multi_indices.select('NDVI').median()
-        median_ndwi = multi_indices.select('NDWI').median()
-        median_gndvi = multi_indices.select('GNDVI').median()
+        # Median of each index, as one multi-band image so a single round-trip samples every
+        # index at each point
+        indices_image = multi_indices.select(list(self.indices)).median()
         
         # Ultra-dense sampling
         max_points = 20000
-        step = max(1, len(lats) * len(lons) // max_points)
-        sampling_points = []
+        sampling_coords = _sampling_coords(lats, lons, max_points)
         
-        for i in range(0, len(lats), step):
-            for j in range(0, len(lons), step):
-                if len(sampling_points) >= max_points:
-                    break
-                sampling_points.append(ee.Geometry.Point([lons[j], lats[i]]))
+        logger.info(f"Sampling {len(sampling_coords)} points with multiple indices...")
         
-        logger.info(f"Sampling {len(sampling_points)} points with multiple indices...")
-        
-        # Sample all indices
-        try:
-            ndvi_data = median_ndvi.sampleRegions(
-                collection=ee.FeatureCollection(sampling_points),
-                scale=10,
-                geometries=True
-            ).getInfo()
-            
-            ndwi_data = median_ndwi.sampleRegions(
-                collection=ee.FeatureCollection(sampling_points),
-                scale=10,
-                geometries=True
-            ).getInfo()
-            
-            gndvi_data = median_gndvi.sampleRegions(
-                collection=ee.FeatureCollection(sampling_points),
+        def sample_chunk(coords):
+            # Send plain coordinate pairs and build the point features server-side
+            points = ee.List(coords.tolist()).map(lambda xy: ee.Feature(ee.Geometry.Point(xy)))
+            return indices_image.sampleRegions(
+                collection=ee.FeatureCollection(points),
                 scale=10,
                 geometries=True
             ).getInfo()
+        
+        # Bounded requests instead of one huge FeatureCollection payload
+        chunks = [sampling_coords[i:i + EE_SAMPLE_CHUNK_SIZE]
+                  for i in range(0, len(sampling_coords), EE_SAMPLE_CHUNK_SIZE)]
+        
+        try:
+            with ThreadPoolExecutor(max_workers=EE_SAMPLE_WORKERS) as executor:
+                chunk_results = list(executor.map(sample_chunk, chunks))
             
-            logger.info("✓ Multi-index sampling successful")
+            # Each sampled feature carries one property per index; map() keeps chunk order
+            sampled_data = {'features': [f for result in chunk_results for f in result.get('features', [])]}
+            logger.info(f"✓ Multi-index sampling successful ({len(chunks)} requests)")
+            return sampled_data
             
         except Exception as e:
             logger.warning(f"Sampling failed: {e}")
             logger.info("Using direct array extraction...")
-            # Fallback to array method
-            ndvi_array = median_ndvi.sampleRectangle(region=study_area, defaultValue=0).getInfo()
-            ndwi_array = median_ndwi.sampleRectangle(region=study_area, defaultValue=0).getInfo()
-            gndvi_array = median_gndvi.sampleRectangle(region=study_area, defaultValue=0).getInfo()
-            
-            ndvi_data = {'NDVI': ndvi_array['NDVI']}
-            ndwi_data = {'NDWI': ndwi_array['NDWI']}
-            gndvi_data = {'GNDVI': gndvi_array['GNDVI']}
+            # Fallback to array method (band arrays come back as feature properties)
+            index_arrays = indices_image.sampleRectangle(region=study_area, defaultValue=0).getInfo()
+            index_arrays = index_arrays.get('properties', index_arrays)
             logger.info("✓ Array extraction successful")
-        
-        # Process results with multiple strategies
-        tree_density = np.zeros((len(lats), len(lons)))
-        
-        if 'features' in ndvi_data:
-            logger.info(f"Processing {len(ndvi_data['features'])} points with multiple strategies...")
-            
-            for i, feature in enumerate(ndvi_data['features']):
-                coords = feature['geometry']['coordinates']
-                lon, lat = coords[0], coords[1]
-                lat_idx = np.argmin(np.abs(lats - lat))
-                lon_idx = np.argmin(np.abs(lons - lon))
-                
-                # Get all vegetation indices
-                ndvi_val = feature['properties'].get('NDVI', 0)
-                ndwi_val = ndwi_data['features'][i]['properties'].get('NDWI', 0) if i < len(ndwi_data['features']) else 0
-                gndvi_val = gndvi_data['features'][i]['properties'].get('GNDVI', 0) if i < len(gndvi_data['features']) else 0
-                
-                # Multi-strategy tree detection
-                tree_score = 0
-                
-                # Strategy 1: NDVI (vegetation health)
-                if ndvi_val and ndvi_val > 0.1:
-                    tree_score += (ndvi_val - 0.1) / 0.5
-                
-                # Strategy 2: NDWI (water content - trees have more water)
-                if ndwi_val and ndwi_val > 0.1:
-                    tree_score += (ndwi_val - 0.1) / 0.3
-                
-                # Strategy 3: GNDVI (green vegetation)
-                if gndvi_val and gndvi_val > 0.1:
-                    tree_score += (gndvi_val - 0.1) / 0.4
-                
-                # Strategy 4: Combined score with weights
-                if tree_score > 0:
-                    weighted_score = (tree_score * 0.4 + ndvi_val * 0.6) if ndvi_val else tree_score
-                    tree_density[lat_idx, lon_idx] = max(0, min(1, weighted_score))
-        
-        elif 'NDVI' in ndvi_data:
-            logger.info("Processing arrays with multi-strategy interpolation...")
-            ndvi_array = np.array(ndvi_data['NDVI'])
-            ndwi_array = np.array(ndwi_data['NDWI'])
-            gndvi_array = np.array(gndvi_data['GNDVI'])
-            
-            if ndvi_array.size > 0 and SCIPY_AVAILABLE:
-                # Interpolate all indices
-                ndvi_lats = np.linspace(self.south, self.north, ndvi_array.shape[0])
-                ndvi_lons = np.linspace(self.west, self.east, ndvi_array.shape[1])
-                ndvi_lon_grid, ndvi_lat_grid = np.meshgrid(ndvi_lons, ndvi_lats)
-                ndvi_points = np.column_stack([ndvi_lat_grid.ravel(), ndvi_lon_grid.ravel()])
-                
-                target_lats, target_lons = np.meshgrid(lats, lons, indexing='ij')
-                target_points = np.column_stack([target_lats.ravel(), target_lons.ravel()])
-                
-                # Interpolate each index
-                ndvi_interp = griddata(ndvi_points, ndvi_array.ravel(), target_points, method='linear', fill_value=0)
-                ndwi_interp = griddata(ndvi_points, ndwi_array.ravel(), target_points, method='linear', fill_value=0)
-                gndvi_interp = griddata(ndvi_points, gndvi_array.ravel(), target_points, method='linear', fill_value=0)
-                
-                # Reshape and combine
-                ndvi_interp = ndvi_interp.reshape(len(lats), len(lons))
-                ndwi_interp = ndwi_interp.reshape(len(lats), len(lons))
-                gndvi_interp = gndvi_interp.reshape(len(lats), len(lons))
-                
-                # Multi-strategy combination
-                tree_density = np.maximum(0, np.minimum(1, 
-                    (ndvi_interp - 0.1) / 0.5 * 0.6 + 
-                    (ndwi_interp - 0.1) / 0.3 * 0.2 + 
-                    (gndvi_interp - 0.1) / 0.4 * 0.2
-                ))
-                logger.info("✓ Multi-strategy interpolation complete")
-            else:
-                logger.warning("Array processing failed - using simulation")
-                return self._detect_with_simulation(lats, lons)
-        
-        # Convert to tree locations
-        tree_threshold = 0.15
-        tree_mask = tree_density > tree_threshold
-        tree_indices = np.where(tree_mask)
-        detected_trees_lat = lats[tree_indices[0]]
-        detected_trees_lon = lons[tree_indices[1]]
-        detected_trees_density = tree_density[tree_indices]
-        
-        enhanced_trees_df = pd.DataFrame({
-            'latitude': detected_trees_lat,
-            'longitude': detected_trees_lon,
-            'density': detected_trees_density,
-            'source': 'satellite_enhanced_multi_strategy'
-        })
-        
-        logger.info(f"✓ Detected {len(enhanced_trees_df)} trees using satellite data")
-        logger.info(f"Grid resolution: {grid_size*111:.0f}m per cell")
-        logger.info(f"Threshold used: {tree_threshold}")
-        logger.info(f"Tree density range: {detected_trees_density.min():.3f} - {detected_trees_density.max():.3f}")
-        
-        return enhanced_trees_df
+            return {band: index_arrays[band] for band in self.indices}
     
     def _detect_with_simulation(self, lats: np.ndarray, lons: np.ndarray) -> pd.DataFrame:
         """Fallback simulation when satellite data is not available."""
         logger.info("Using enhanced simulated data...")
-        tree_density = np.zeros((len(lats), len(lons)))
         center_lat, center_lon = 39.955, -75.16
         
-        # More realistic simulation with multiple tree types
-        for i in range(len(lats)):
-            for j in range(len(lons)):
-                lat, lon = lats[i], lons[j]
-                dist = np.sqrt((lat - center_lat)**2 + (lon - center_lon)**2)
-                
-                # Simulate different tree types
-                if dist < 0.005:  # Parks/squares
-                    tree_density[i, j] = np.random.uniform(0.8, 1.0)
-                elif dist < 0.01:  # Residential
-                    tree_density[i, j] = np.random.uniform(0.6, 0.9)
-                elif dist < 0.015:  # Mixed areas
-                    tree_density[i, j] = np.random.uniform(0.3, 0.7)
-                elif dist < 0.02:  # Commercial
-                    tree_density[i, j] = np.random.uniform(0.1, 0.5)
-                else:  # Edge areas
-                    tree_density[i, j] = np.random.uniform(0.0, 0.3)
+        # More realistic simulation with multiple tree types, for the whole grid at once
+        dist = np.sqrt((lats[:, None] - center_lat)**2 + (lons[None, :] - center_lon)**2)
+        
+        # Simulate different tree types: uniform density range per distance band
+        bands = [
+            dist < 0.005,  # Parks/squares
+            dist < 0.01,   # Residential
+            dist < 0.015,  # Mixed areas
+            dist < 0.02,   # Commercial
+        ]
+        low = np.select(bands, [0.8, 0.6, 0.3, 0.1], default=0.0)  # Edge areas default
+        high = np.select(bands, [1.0, 0.9, 0.7, 0.5], default=0.3)
+        
+        # One draw per cell in row-major order, the same stream the per-cell uniform() calls used
+        tree_density = low + (high - low) * np.random.random_sample(dist.shape)
         
         # Convert to tree locations
         tree_threshold = 0.15
@@ -432,26 +602,25 @@ class TreeVisualizer:
         ).add_to(m)
         
         # Add trees with confidence-based coloring
-        for idx, tree in trees_df.iterrows():
-            if tree['source'] == 'osm':
-                color, size = 'green', 4
-            elif tree['confidence'] > 0.8:
-                color, size = 'darkred', 5
-            elif tree['confidence'] > 0.6:
-                color, size = 'red', 4
-            elif tree['confidence'] > 0.4:
-                color, size = 'orange', 3
-            else:
-                color, size = 'yellow', 2
-            
-            folium.CircleMarker(
-                location=[tree['latitude'], tree['longitude']],
-                radius=size,
-                popup=f"Tree {idx}<br>Source: {tree['source']}<br>Confidence: {tree['confidence']:.3f}",
-                color=color,
-                fill=True,
-                fillOpacity=0.8
-            ).add_to(m)
+        sources = trees_df['source'].to_numpy()
+        confidence = trees_df['confidence'].to_numpy(dtype=float)
+        tiers = np.select(
+            [sources == 'osm', confidence > 0.8, confidence > 0.6, confidence > 0.4],
+            [0, 1, 2, 3],
+            default=4
+        )
+        styles = [
+            ('OSM trees', 'green', 4),
+            ('Confidence > 0.8', 'darkred', 5),
+            ('Confidence > 0.6', 'red', 4),
+            ('Confidence > 0.4', 'orange', 3),
+            ('Confidence <= 0.4', 'yellow', 2),
+        ]
+        popups = [
+            f"Tree {idx}<br>Source: {source}<br>Confidence: {conf:.3f}"
+            for idx, source, conf in zip(trees_df.index, sources, confidence)
+        ]
+        _add_tree_layers(m, trees_df, tiers, styles, popups)
         
         folium.LayerControl().add_to(m)
         m.save(output_file)
@@ -471,9 +640,28 @@ class TreeDetectionManager:
             bbox: Bounding box as (north, south, east, west)
         """
         self.bbox = bbox
-        self.osm_fetcher = OSMTreeFetcher(bbox)
-        self.enhanced_detector = EnhancedTreeDetector(bbox)
-        self.visualizer = TreeVisualizer(bbox)
+        # Helpers are built on first use, so e.g. saving cached trees never touches Earth Engine
+        self._osm_fetcher: Optional[OSMTreeFetcher] = None
+        self._enhanced_detector: Optional[EnhancedTreeDetector] = None
+        self._visualizer: Optional[TreeVisualizer] = None
+    
+    @property
+    def osm_fetcher(self) -> OSMTreeFetcher:
+        if self._osm_fetcher is None:
+            self._osm_fetcher = OSMTreeFetcher(self.bbox)
+        return self._osm_fetcher
+    
+    @property
+    def enhanced_detector(self) -> EnhancedTreeDetector:
+        if self._enhanced_detector is None:
+            self._enhanced_detector = EnhancedTreeDetector(self.bbox)
+        return self._enhanced_detector
+    
+    @property
+    def visualizer(self) -> TreeVisualizer:
+        if self._visualizer is None:
+            self._visualizer = TreeVisualizer(self.bbox)
+        return self._visualizer
         
     def detect_all_trees(self) -> pd.DataFrame:
         """
@@ -490,28 +678,30 @@ class TreeDetectionManager:
         # Get enhanced detection trees
         enhanced_trees = self.enhanced_detector.detect_additional_trees()
         
-        # Combine all tree data
-        all_trees = []
-        
-        # Add OSM trees (with confidence column)
-        for _, tree in osm_trees.iterrows():
-            all_trees.append({
-                'latitude': tree['latitude'],
-                'longitude': tree['longitude'],
+        # Drop enhanced detections that are just OSM trees seen from the satellite
+        duplicates = _near_trees(osm_trees, enhanced_trees, OSM_DEDUP_RADIUS)
+        if duplicates.any():
+            logger.info(f"Dropping {int(duplicates.sum())} enhanced detections within "
+                        f"{OSM_DEDUP_RADIUS * 111000:.0f}m of an OSM tree")
+            enhanced_trees = enhanced_trees[~duplicates]
+        
+        # Combine all tree data column-wise
+        final_trees = pd.concat([
+            # OSM trees (with confidence column)
+            pd.DataFrame({
+                'latitude': osm_trees['latitude'].to_numpy(),
+                'longitude': osm_trees['longitude'].to_numpy(),
                 'confidence': 1.0,  # OSM trees are high confidence
                 'source': 'osm'
-            })
-        
-        # Add enhanced detection trees
-        for _, tree in enhanced_trees.iterrows():
-            all_trees.append({
-                'latitude': tree['latitude'],
-                'longitude': tree['longitude'],
-                'confidence': tree.get('density', tree.get('confidence', 1.0)),
-                'source': tree['source']
-            })
-        
-        final_trees = pd.DataFrame(all_trees)
+            }),
+            # Enhanced detection trees
+            pd.DataFrame({
+                'latitude': enhanced_trees['latitude'].to_numpy(),
+                'longitude': enhanced_trees['longitude'].to_numpy(),
+                'confidence': _tree_densities(enhanced_trees),
+                'source': enhanced_trees['source'].to_numpy()
+            }),
+        ], ignore_index=True)
         
         logger.info(f"Total trees detected: {len(final_trees)}")
         logger.info(f"  - OSM: {len(osm_trees)}")
@@ -525,25 +715,36 @@ class TreeDetectionManager:
         
         return final_trees
     
-    def save_trees(self, trees_df: pd.DataFrame, output_file: str = 'tree_positions.json') -> None:
+    def save_trees(self, trees_df: pd.DataFrame, output_file: str = 'tree_positions.json',
+                   indent: bool = True, parquet_file: Optional[str] = None) -> None:
         """
         Save tree data to JSON file.
         
         Args:
             trees_df: DataFrame containing tree data
             output_file: Output file path
+            indent: Pretty-print with 2-space indentation (compact output is much smaller)
+            parquet_file: Optional path for a zstd-compressed Parquet copy (needs pyarrow);
+                the JSON metadata is stored in the Parquet schema metadata
         """
+        densities = _tree_densities(trees_df)
+        
         # Convert DataFrame to the same format as the notebook
-        trees_list = []
-        for idx, tree in trees_df.iterrows():
-            tree_dict = {
+        trees_list = [
+            {
                 'id': idx,
-                'latitude': float(tree['latitude']),
-                'longitude': float(tree['longitude']),
-                'density': float(tree.get('density', tree.get('confidence', 1.0))),
+                'latitude': latitude,
+                'longitude': longitude,
+                'density': density,
                 'grid_size': '5m'
             }
-            trees_list.append(tree_dict)
+            for idx, latitude, longitude, density in zip(
+                trees_df.index.tolist(),
+                trees_df['latitude'].to_numpy(dtype=float).tolist(),
+                trees_df['longitude'].to_numpy(dtype=float).tolist(),
+                densities.tolist(),
+            )
+        ]
         
         tree_data = {
             'metadata': {
@@ -562,10 +763,30 @@ class TreeDetectionManager:
             'trees': trees_list
         }
         
-        with open(output_file, 'w') as f:
-            json.dump(tree_data, f, indent=2)
+        if ORJSON_AVAILABLE:
+            option = orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_INDENT_2 if indent else 0)
+            with open(output_file, 'wb') as f:
+                f.write(orjson.dumps(tree_data, option=option))
+        else:
+            with open(output_file, 'w') as f:
+                json.dump(tree_data, f, indent=2 if indent else None, separators=None if indent else (',', ':'))
         
         logger.info(f"Tree positions saved to {output_file}")
+        
+        if parquet_file:
+            if not PYARROW_AVAILABLE:
+                logger.warning(f"pyarrow not available - skipping {parquet_file}")
+                return
+            table = pa.table({
+                'id': trees_df.index.to_numpy(),
+                'latitude': trees_df['latitude'].to_numpy(dtype=float),
+                'longitude': trees_df['longitude'].to_numpy(dtype=float),
+                'density': densities,
+                'source': trees_df['source'].to_numpy()
+            })
+            table = table.replace_schema_metadata({'tree_metadata': json.dumps(tree_data['metadata'])})
+            pq.write_table(table, parquet_file, compression='zstd')
+            logger.info(f"Tree positions saved to {parquet_file}")
     
     def create_visualization(self, trees_df: pd.DataFrame, 
                            output_file: str = 'tree_detection_map.html') -> folium.Map:
@@ -615,29 +836,20 @@ def create_visualization(trees_df: pd.DataFrame, output_file: str = 'tree_detect
     ).add_to(m)
     
     # Add trees with density-based coloring
-    for idx, tree in trees_df.iterrows():
-        density = tree.get('density', tree.get('confidence', 1.0))
-        
-        # Color-code by density
-        if density > 0.8:
-            color, size = 'darkred', 5
-        elif density > 0.6:
-            color, size = 'red', 4
-        elif density > 0.4:
-            color, size = 'orange', 3
-        elif density > 0.3:
-            color, size = 'blue', 2
-        else:
-            color, size = 'green', 2
-        
-        folium.CircleMarker(
-            location=[tree['latitude'], tree['longitude']],
-            radius=size,
-            popup=f"Tree {idx}<br>Density: {density:.3f}<br>Source: {tree['source']}<br>Grid: 5m",
-            color=color,
-            fill=True,
-            fillOpacity=0.8
-        ).add_to(m)
+    densities = _tree_densities(trees_df)
+    tiers = np.select([densities > 0.8, densities > 0.6, densities > 0.4, densities > 0.3], [0, 1, 2, 3], default=4)
+    styles = [
+        ('Density > 0.8', 'darkred', 5),
+        ('Density > 0.6', 'red', 4),
+        ('Density > 0.4', 'orange', 3),
+        ('Density > 0.3', 'blue', 2),
+        ('Density <= 0.3', 'green', 2),
+    ]
+    popups = [
+        f"Tree {idx}<br>Density: {density:.3f}<br>Source: {source}<br>Grid: 5m"
+        for idx, density, source in zip(trees_df.index, densities, trees_df['source'])
+    ]
+    _add_tree_layers(m, trees_df, tiers, styles, popups)
     
     folium.LayerControl().add_to(m)
     m.save(output_file)
@@ -5,16 +5,46 @@ This module generates circular shadow polygons for trees based on density data.
 Filters trees by density >= 0.2 and maps density [0.2, 1.0] to shadow radius [1m, 5m] linearly.
 """
 
+import gc
+import hashlib
 import json
 import math
 import os
-from typing import List, Dict, Any, Optional
+import random
+import zlib
+from typing import List, Dict, Any, Iterable, Iterator, Optional, TextIO
 import logging
 
+import numpy as np
+
+# Try to import orjson for faster tree data parsing
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def _tree_columns(trees: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Split tree records into an ID list and float64 coordinate/density arrays (missing values -> NaN)."""
+    return {
+        'id': [tree.get('id') for tree in trees],
+        'latitude': np.array([tree.get('latitude') for tree in trees], dtype=float),
+        'longitude': np.array([tree.get('longitude') for tree in trees], dtype=float),
+        'density': np.array([tree.get('density', 0) for tree in trees], dtype=float),
+    }
+
+
+def _json_default(obj: Any) -> Any:
+    """json.dumps fallback for the NumPy coordinate rings in shadow features."""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
 class TreeShadowGenerator:
     """
     Generates circular shadow polygons for trees based on density data.
@@ -27,16 +57,20 @@ class TreeShadowGenerator:
     - Returns GeoJSON FeatureCollection format
     """
     
-    def __init__(self, tree_data_path: str):
+    def __init__(self, tree_data_path: str, polygon_mode: bool = True):
         """
         Initialize the TreeShadowGenerator.
         
         Args:
             tree_data_path: Path to tree_positions.json file
+            polygon_mode: Emit organic canopy polygons; when False, emit Point features
+                and let the client draw a circle of shadow_radius_m around each
         """
         self.tree_data_path = tree_data_path
-        self.trees: List[Dict[str, Any]] = []
-        self.filtered_trees: List[Dict[str, Any]] = []
+        self.polygon_mode = polygon_mode
+        # Tree data as columns: 'id' list plus 'latitude'/'longitude'/'density' arrays
+        self.trees: Dict[str, Any] = _tree_columns([])
+        self.filtered_trees: Dict[str, Any] = _tree_columns([])
         self.shadow_polygons: List[Dict[str, Any]] = []
         
         # Constants for coordinate conversion (approximation)
@@ -46,6 +80,20 @@ class TreeShadowGenerator:
         self.MIN_RADIUS = 8.0  # meters - increased for better visibility
         self.MAX_RADIUS = 25.0  # meters - much larger for route impact
         self.POLYGON_POINTS = 24  # more points for smoother curves
+        self.BATCH_SIZE = 4096  # trees per polygon batch when streaming features
+        self.SHAPE_TEMPLATES = 64  # distinct canopy outlines shared by all trees (0 = one per tree)
+        
+        # Spans of the density -> radius mapping
+        self._density_range = self.MAX_DENSITY - self.MIN_DENSITY
+        self._radius_range = self.MAX_RADIUS - self.MIN_RADIUS
+        
+        # Vertex angles shared by every canopy polygon
+        self._angles = 2 * math.pi * np.arange(self.POLYGON_POINTS) / self.POLYGON_POINTS
+        self._sin_angles = np.sin(self._angles)
+        self._cos_angles = np.cos(self._angles)
+        
+        # Unit-radius outlines, picked per tree by ID and scaled into place
+        self._templates = self.canopy_outlines(range(self.SHAPE_TEMPLATES))
         
         logger.info(f"TreeShadowGenerator initialized with data path: {tree_data_path}")
     
@@ -55,11 +103,15 @@ class TreeShadowGenerator:
             if not os.path.exists(self.tree_data_path):
                 raise FileNotFoundError(f"Tree data file not found: {self.tree_data_path}")
             
-            with open(self.tree_data_path, 'r') as f:
-                data = json.load(f)
+            if ORJSON_AVAILABLE:
+                with open(self.tree_data_path, 'rb') as f:
+                    data = orjson.loads(f.read())
+            else:
+                with open(self.tree_data_path, 'r') as f:
+                    data = json.load(f)
             
-            self.trees = data.get('trees', [])
-            total_trees = len(self.trees)
+            self.trees = _tree_columns(data.get('trees', []))
+            total_trees = len(self.trees['id'])
             
             logger.info(f"Loaded {total_trees} trees from {self.tree_data_path}")
             
@@ -71,18 +123,31 @@ class TreeShadowGenerator:
             raise
     
     def filter_trees_by_density(self) -> None:
-        """Filter trees by density >= 0.2."""
-        if not self.trees:
+        """Filter trees by density >= 0.2, dropping trees without an ID or coordinates."""
+        if not self.trees['id']:
             logger.warning("No trees loaded. Call load_tree_data() first.")
             return
         
-        self.filtered_trees = [
-            tree for tree in self.trees 
-            if tree.get('density', 0) >= self.MIN_DENSITY
-        ]
+        trees = self.trees
+        keep = trees['density'] >= self.MIN_DENSITY
+        
+        # Validate required fields once here, so generation can trust every filtered tree
+        valid = ~(np.isnan(trees['latitude']) | np.isnan(trees['longitude']))
+        valid &= np.array([tree_id is not None for tree_id in trees['id']], dtype=bool)
+        for i in np.flatnonzero(keep & ~valid).tolist():
+            logger.warning(f"Skipping tree with missing data: id={trees['id'][i]}, "
+                           f"latitude={trees['latitude'][i]}, longitude={trees['longitude'][i]}")
+        
+        keep = np.flatnonzero(keep & valid)
+        self.filtered_trees = {
+            'id': [self.trees['id'][i] for i in keep.tolist()],
+            'latitude': self.trees['latitude'][keep],
+            'longitude': self.trees['longitude'][keep],
+            'density': self.trees['density'][keep],
+        }
         
-        original_count = len(self.trees)
-        filtered_count = len(self.filtered_trees)
+        original_count = len(self.trees['id'])
+        filtered_count = len(self.filtered_trees['id'])
         
         logger.info(f"Filtered {original_count} trees to {filtered_count} trees with density >= {self.MIN_DENSITY}")
         logger.info(f"Filtering removed {original_count - filtered_count} trees ({((original_count - filtered_count) / original_count * 100):.1f}%)")
@@ -101,14 +166,28 @@ class TreeShadowGenerator:
         density = max(self.MIN_DENSITY, min(self.MAX_DENSITY, density))
         
         # Linear mapping: radius = min_radius + (density - min_density) * (max_radius - min_radius) / (max_density - min_density)
-        normalized_density = (density - self.MIN_DENSITY) / (self.MAX_DENSITY - self.MIN_DENSITY)
-        radius = self.MIN_RADIUS + normalized_density * (self.MAX_RADIUS - self.MIN_RADIUS)
+        normalized_density = (density - self.MIN_DENSITY) / self._density_range
+        radius = self.MIN_RADIUS + normalized_density * self._radius_range
         
         return radius
     
+    def densities_to_radii(self, densities: np.ndarray) -> np.ndarray:
+        """
+        Vectorized density_to_radius over an array of densities.
+        
+        Args:
+            densities: Tree density values
+            
+        Returns:
+            Shadow radii in meters
+        """
+        densities = np.clip(densities, self.MIN_DENSITY, self.MAX_DENSITY)
+        normalized_density = (densities - self.MIN_DENSITY) / self._density_range
+        return self.MIN_RADIUS + normalized_density * self._radius_range
+    
     def meters_to_degrees(self, meters: float, latitude: float) -> tuple[float, float]:
         """
-        Convert meters to degrees for latitude and longitude.
+        Convert meters to degrees for latitude and longitude (scalars or NumPy arrays).
         
         Args:
             meters: Distance in meters
@@ -121,102 +200,170 @@ class TreeShadowGenerator:
         lat_degrees = meters / self.METERS_PER_DEGREE_LAT
         
         # Longitude: varies by latitude, 1 degree ≈ 111,000 * cos(latitude) meters
-        lng_degrees = meters / (self.METERS_PER_DEGREE_LAT * math.cos(math.radians(latitude)))
+        lng_degrees = meters / (self.METERS_PER_DEGREE_LAT * np.cos(np.radians(latitude)))
         
         return lat_degrees, lng_degrees
     
-    def generate_organic_tree_canopy(self, center_lat: float, center_lng: float, radius_meters: float, tree_id: int = 0) -> List[List[float]]:
+    def canopy_shape_parameters(self, tree_id: Any) -> List[float]:
         """
-        Generate an organic, tree canopy-like polygon with wavy edges.
+        Random wave parameters of a tree's canopy outline, seeded by its ID.
         
         Args:
-            center_lat: Center latitude
-            center_lng: Center longitude
-            radius_meters: Base radius in meters
             tree_id: Tree ID for consistent randomization
             
         Returns:
-            List of [lng, lat] coordinate pairs forming an organic polygon
+            [primary_freq, primary_amplitude, secondary_freq, secondary_amplitude,
+             tertiary_freq, tertiary_amplitude]
         """
-        coordinates = []
-        
-        # Convert radius to degrees
-        lat_degrees, lng_degrees = self.meters_to_degrees(radius_meters, center_lat)
-        
         # Use tree_id as seed for consistent but varied shapes per tree
-        import random
         random.seed(tree_id)
         
         # Generate multiple frequency components for organic variation
-        # Primary wave (large lobes)
-        primary_freq = random.uniform(3, 7)  # 3-7 major lobes
-        primary_amplitude = random.uniform(0.2, 0.4)  # 20-40% radius variation
-        
-        # Secondary wave (smaller bumps)
-        secondary_freq = random.uniform(8, 16)  # 8-16 smaller variations
-        secondary_amplitude = random.uniform(0.1, 0.2)  # 10-20% radius variation
-        
-        # Tertiary wave (fine detail)
-        tertiary_freq = random.uniform(20, 32)  # 20-32 fine details
-        tertiary_amplitude = random.uniform(0.05, 0.1)  # 5-10% radius variation
+        return [
+            random.uniform(3, 7),  # Primary wave: 3-7 major lobes
+            random.uniform(0.2, 0.4),  # 20-40% radius variation
+            random.uniform(8, 16),  # Secondary wave: 8-16 smaller bumps
+            random.uniform(0.1, 0.2),  # 10-20% radius variation
+            random.uniform(20, 32),  # Tertiary wave: 20-32 fine details
+            random.uniform(0.05, 0.1),  # 5-10% radius variation
+        ]
+    
+    def template_index(self, tree_id: Any) -> int:
+        """
+        Index of the canopy outline template used for a tree.
         
-        # Generate points around the organic shape
-        for i in range(self.POLYGON_POINTS):
-            angle = 2 * math.pi * i / self.POLYGON_POINTS
-            
-            # Calculate organic radius variation using multiple sine waves
-            primary_variation = math.sin(primary_freq * angle) * primary_amplitude
-            secondary_variation = math.sin(secondary_freq * angle) * secondary_amplitude
-            tertiary_variation = math.sin(tertiary_freq * angle) * tertiary_amplitude
-            
-            # Combine variations for organic shape (always positive radius)
-            radius_multiplier = 1.0 + primary_variation + secondary_variation + tertiary_variation
-            radius_multiplier = max(0.3, radius_multiplier)  # Ensure minimum 30% of base radius
-            
-            # Apply organic radius to base coordinates
-            organic_lat_degrees = lat_degrees * radius_multiplier
-            organic_lng_degrees = lng_degrees * radius_multiplier
+        Args:
+            tree_id: Tree ID (integer IDs map directly; others are hashed stably)
             
-            # Calculate point coordinates
-            point_lat = center_lat + organic_lat_degrees * math.sin(angle)
-            point_lng = center_lng + organic_lng_degrees * math.cos(angle)
+        Returns:
+            Index into the template pool
+        """
+        if not isinstance(tree_id, int):
+            tree_id = zlib.crc32(str(tree_id).encode())
+        return tree_id % self.SHAPE_TEMPLATES
+    
+    def canopy_outlines(self, seeds: Iterable[Any]) -> np.ndarray:
+        """
+        Unit-radius organic canopy outlines with wavy edges.
+        
+        Args:
+            seeds: Seeds for the random wave parameters, one outline per seed
             
-            # GeoJSON uses [longitude, latitude] format
-            coordinates.append([point_lng, point_lat])
+        Returns:
+            Array of shape (N, POLYGON_POINTS, 2) with [x, y] offsets at radius 1
+        """
+        params = np.array([self.canopy_shape_parameters(seed) for seed in seeds]).reshape(-1, 6)
+        primary_freq, primary_amplitude, secondary_freq, secondary_amplitude, tertiary_freq, tertiary_amplitude = (
+            params[:, k, None] for k in range(6)
+        )
+        
+        # Organic radius variation at every vertex of every tree, using multiple sine waves
+        angles = self._angles
+        primary_variation = np.sin(primary_freq * angles) * primary_amplitude
+        secondary_variation = np.sin(secondary_freq * angles) * secondary_amplitude
+        tertiary_variation = np.sin(tertiary_freq * angles) * tertiary_amplitude
+        
+        # Combine variations for organic shape (always positive radius)
+        radius_multiplier = 1.0 + primary_variation + secondary_variation + tertiary_variation
+        radius_multiplier = np.maximum(0.3, radius_multiplier)  # Ensure minimum 30% of base radius
+        
+        return np.stack((radius_multiplier * self._cos_angles, radius_multiplier * self._sin_angles), axis=-1)
+    
+    def generate_organic_tree_canopies(self, center_lats: np.ndarray, center_lngs: np.ndarray,
+                                       radii_meters: np.ndarray, tree_ids: List[Any]) -> np.ndarray:
+        """
+        Generate organic, tree canopy-like polygons with wavy edges for many trees at once.
         
-        # Close the polygon by repeating the first point
-        coordinates.append(coordinates[0])
+        Args:
+            center_lats: Center latitudes, shape (N,)
+            center_lngs: Center longitudes, shape (N,)
+            radii_meters: Base radii in meters, shape (N,)
+            tree_ids: Tree IDs for consistent randomization
+            
+        Returns:
+            Array of shape (N, POLYGON_POINTS + 1, 2) with closed [lng, lat] rings
+        """
+        # Convert radii to degrees, one column per tree
+        lat_degrees, lng_degrees = self.meters_to_degrees(radii_meters, center_lats)
+        lat_degrees, lng_degrees = lat_degrees[:, None], lng_degrees[:, None]
+        
+        # Trees share the outline template picked by their ID; outlines are only
+        # generated per tree when templates are disabled
+        if self.SHAPE_TEMPLATES:
+            outlines = self._templates[[self.template_index(tree_id) for tree_id in tree_ids]]
+        else:
+            outlines = self.canopy_outlines(tree_ids)
+        
+        # Apply organic radius to base coordinates; GeoJSON uses [longitude, latitude] format,
+        # and the last vertex repeats the first to close each polygon
+        coordinates = np.empty((len(outlines), self.POLYGON_POINTS + 1, 2))
+        coordinates[:, :-1, 0] = center_lngs[:, None] + lng_degrees * outlines[..., 0]
+        coordinates[:, :-1, 1] = center_lats[:, None] + lat_degrees * outlines[..., 1]
+        coordinates[:, -1] = coordinates[:, 0]
         
         return coordinates
     
-    def generate_shadow_polygons(self) -> None:
-        """Generate organic tree canopy shadow polygons for all filtered trees."""
-        if not self.filtered_trees:
-            logger.warning("No filtered trees available. Call filter_trees_by_density() first.")
-            return
+    def generate_organic_tree_canopy(self, center_lat: float, center_lng: float, radius_meters: float, tree_id: int = 0) -> List[List[float]]:
+        """
+        Generate an organic, tree canopy-like polygon with wavy edges.
         
-        self.shadow_polygons = []
+        Args:
+            center_lat: Center latitude
+            center_lng: Center longitude
+            radius_meters: Base radius in meters
+            tree_id: Tree ID for consistent randomization
+            
+        Returns:
+            List of [lng, lat] coordinate pairs forming an organic polygon
+        """
+        return self.generate_organic_tree_canopies(
+            np.array([center_lat], dtype=float), np.array([center_lng], dtype=float),
+            np.array([radius_meters], dtype=float), [tree_id]
+        )[0].tolist()
+    
+    def iter_shadow_features(self, batch_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield organic tree canopy shadow features for the filtered trees.
         
-        for tree in self.filtered_trees:
-            try:
-                tree_id = tree.get('id')
-                latitude = tree.get('latitude')
-                longitude = tree.get('longitude')
-                density = tree.get('density', 0)
-                
-                # Validate required fields
-                if any(x is None for x in [tree_id, latitude, longitude]):
-                    logger.warning(f"Skipping tree with missing data: {tree}")
-                    continue
-                
-                # Calculate shadow radius based on density
-                radius = self.density_to_radius(density)
-                
-                # Generate organic tree canopy polygon
-                polygon_coords = self.generate_organic_tree_canopy(latitude, longitude, radius, tree_id)
-                
+        Args:
+            batch_size: Compute polygons for this many trees at a time, so only one batch
+                of coordinates is held in memory while the features are consumed
+                (default: all trees in one batch)
+        
+        Yields:
+            GeoJSON Feature dicts whose polygon ring is a (POLYGON_POINTS + 1, 2) float64 array
+        """
+        trees = self.filtered_trees
+        batch_size = batch_size or max(1, len(trees['id']))
+        for start in range(0, len(trees['id']), batch_size):
+            batch = slice(start, start + batch_size)
+            
+            # Columns of the batch, so radii and polygons are computed for all its trees at once
+            tree_ids = trees['id'][batch]
+            latitudes = trees['latitude'][batch]
+            longitudes = trees['longitude'][batch]
+            densities = trees['density'][batch]
+            
+            # Calculate shadow radius based on density
+            radii = self.densities_to_radii(densities)
+            
+            if self.polygon_mode:
+                # Generate organic tree canopy polygons; rings stay rows of the batch array
+                # (no per-vertex Python floats), orjson's OPT_SERIALIZE_NUMPY writes them exactly like lists
+                polygons = self.generate_organic_tree_canopies(latitudes, longitudes, radii, tree_ids)
+                geometries = ({"type": "Polygon", "coordinates": [ring]} for ring in polygons)
+            else:
+                # Just the tree position; the client renders the circle from shadow_radius_m
+                geometries = (
+                    {"type": "Point", "coordinates": [lng, lat]}
+                    for lng, lat in zip(longitudes.tolist(), latitudes.tolist())
+                )
+            
+            for tree_id, latitude, longitude, density, radius, geometry in zip(
+                tree_ids, latitudes.tolist(), longitudes.tolist(), densities.tolist(), radii.tolist(), geometries
+            ):
                 # Create GeoJSON feature
-                feature = {
+                yield {
                     "type": "Feature",
                     "properties": {
                         "id": tree_id,
@@ -227,20 +374,60 @@ class TreeShadowGenerator:
                         "shadow_radius_m": round(radius, 2),
                         "type": "tree_shadow"
                     },
-                    "geometry": {
-                        "type": "Polygon",
-                        "coordinates": [polygon_coords]
-                    }
+                    "geometry": geometry
                 }
-                
-                self.shadow_polygons.append(feature)
-                
-            except Exception as e:
-                logger.error(f"Error generating shadow for tree {tree.get('id', 'unknown')}: {e}")
-                continue
+    
+    def generate_shadow_polygons(self) -> None:
+        """Generate organic tree canopy shadow polygons for all filtered trees."""
+        if not self.filtered_trees['id']:
+            logger.warning("No filtered trees available. Call filter_trees_by_density() first.")
+            return
+        
+        self.shadow_polygons = list(self.iter_shadow_features())
         
         logger.info(f"Generated {len(self.shadow_polygons)} shadow polygons")
     
+    def stream_features(self, out: TextIO, record_separator: bool = False) -> int:
+        """
+        Write shadow features as a GeoJSON text sequence, one compact JSON object per line,
+        without building the whole FeatureCollection in memory.
+        
+        Args:
+            out: Text stream to write to
+            record_separator: Prefix each feature with the RFC 8142 record separator (0x1E)
+            
+        Returns:
+            Number of features written
+        """
+        prefix = '\x1e' if record_separator else ''
+        count = 0
+        for feature in self.iter_shadow_features(self.BATCH_SIZE):
+            out.write(prefix + json.dumps(feature, separators=(',', ':'), default=_json_default) + '\n')
+            count += 1
+        
+        logger.info(f"Streamed {count} shadow features")
+        return count
+    
+    def get_collection_properties(self, total_features: int) -> Dict[str, Any]:
+        """
+        Get the FeatureCollection-level properties describing the shadow generation.
+        
+        Args:
+            total_features: Number of features in the collection
+            
+        Returns:
+            Properties dict
+        """
+        return {
+            "generated_at": "runtime",
+            "total_features": total_features,
+            "description": "Tree shadow polygons for route planning",
+            "density_filter": f">= {self.MIN_DENSITY}",
+            "radius_mapping": f"density [{self.MIN_DENSITY}, {self.MAX_DENSITY}] -> radius [{self.MIN_RADIUS}m, {self.MAX_RADIUS}m]",
+            "polygon_points": self.POLYGON_POINTS,
+            "shape_type": "organic_tree_canopy" if self.polygon_mode else "point_radius"
+        }
+    
     def get_geojson_feature_collection(self) -> Dict[str, Any]:
         """
         Get shadow polygons as GeoJSON FeatureCollection.
@@ -253,18 +440,22 @@ class TreeShadowGenerator:
         
         return {
             "type": "FeatureCollection",
-            "properties": {
-                "generated_at": "runtime",
-                "total_features": len(self.shadow_polygons),
-                "description": "Tree shadow polygons for route planning",
-                "density_filter": f">= {self.MIN_DENSITY}",
-                "radius_mapping": f"density [{self.MIN_DENSITY}, {self.MAX_DENSITY}] -> radius [{self.MIN_RADIUS}m, {self.MAX_RADIUS}m]",
-                "polygon_points": self.POLYGON_POINTS,
-                "shape_type": "organic_tree_canopy"
-            },
+            "properties": self.get_collection_properties(len(self.shadow_polygons)),
             "features": self.shadow_polygons
         }
     
+    def to_bytes(self) -> bytes:
+        """
+        Serialize the shadow FeatureCollection to compact JSON bytes.
+        
+        Returns:
+            UTF-8 encoded GeoJSON (orjson with NumPy support when available)
+        """
+        geojson = self.get_geojson_feature_collection()
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(geojson, option=orjson.OPT_SERIALIZE_NUMPY)
+        return json.dumps(geojson, separators=(',', ':'), default=_json_default).encode('utf-8')
+    
     def get_statistics(self) -> Dict[str, Any]:
         """
         Get statistics about the tree shadow generation.
@@ -272,20 +463,20 @@ class TreeShadowGenerator:
         Returns:
             Dictionary with generation statistics
         """
-        if not self.trees:
+        if not self.trees['id']:
             return {"error": "No tree data loaded"}
         
         # Calculate density distribution
-        density_values = [tree.get('density', 0) for tree in self.filtered_trees]
-        radius_values = [self.density_to_radius(d) for d in density_values]
+        density_values = self.filtered_trees['density'].tolist()
+        radius_values = self.densities_to_radii(self.filtered_trees['density']).tolist()
         
         stats = {
-            "total_trees_loaded": len(self.trees),
-            "trees_after_density_filter": len(self.filtered_trees),
+            "total_trees_loaded": len(self.trees['id']),
+            "trees_after_density_filter": len(self.filtered_trees['id']),
             "shadow_polygons_generated": len(self.shadow_polygons),
             "filter_criteria": {
                 "min_density": self.MIN_DENSITY,
-                "trees_filtered_out": len(self.trees) - len(self.filtered_trees)
+                "trees_filtered_out": len(self.trees['id']) - len(self.filtered_trees['id'])
             },
             "radius_mapping": {
                 "min_radius_m": self.MIN_RADIUS,
@@ -310,6 +501,61 @@ class TreeShadowGenerator:
         
         return stats
     
+    def polygon_cache_path(self) -> str:
+        """
+        Path of the on-disk polygon cache for the current input file and settings.
+        
+        Returns:
+            Cache file path next to the tree data file
+        """
+        stat = os.stat(self.tree_data_path)
+        key = (
+            stat.st_size, stat.st_mtime_ns, self.MIN_DENSITY, self.MAX_DENSITY,
+            self.MIN_RADIUS, self.MAX_RADIUS, self.POLYGON_POINTS, self.SHAPE_TEMPLATES, self.polygon_mode
+        )
+        digest = hashlib.md5(repr(key).encode()).hexdigest()[:16]
+        return f"{self.tree_data_path}.shadows.{digest}.json"
+    
+    def load_cached_polygons(self) -> bool:
+        """
+        Load shadow polygons cached by an earlier run with the same input and settings.
+        
+        Returns:
+            True if the cache was used
+        """
+        cache_path = self.polygon_cache_path()
+        if not os.path.exists(cache_path):
+            return False
+        try:
+            with open(cache_path, 'rb') as f:
+                raw = f.read()
+            # Millions of fresh lists/floats would otherwise trigger repeated full GC passes
+            gc.disable()
+            try:
+                self.shadow_polygons = orjson.loads(raw) if ORJSON_AVAILABLE else json.loads(raw)
+            finally:
+                gc.enable()
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable shadow cache {cache_path}: {e}")
+            return False
+        logger.info(f"Loaded {len(self.shadow_polygons)} shadow polygons from {cache_path}")
+        return True
+    
+    def save_cached_polygons(self) -> None:
+        """Write the generated shadow polygons to the on-disk cache (atomically, compact JSON)."""
+        cache_path = self.polygon_cache_path()
+        tmp_path = f"{cache_path}.tmp"
+        try:
+            if ORJSON_AVAILABLE:
+                with open(tmp_path, 'wb') as f:
+                    f.write(orjson.dumps(self.shadow_polygons, option=orjson.OPT_SERIALIZE_NUMPY))
+            else:
+                with open(tmp_path, 'w') as f:
+                    json.dump(self.shadow_polygons, f, separators=(',', ':'), default=_json_default)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"Could not write shadow cache {cache_path}: {e}")
+    
     def process_all(self) -> Dict[str, Any]:
         """
         Complete processing pipeline: load, filter, generate, and return GeoJSON.
@@ -326,8 +572,10 @@ class TreeShadowGenerator:
             # Step 2: Filter by density
             self.filter_trees_by_density()
             
-            # Step 3: Generate shadow polygons
-            self.generate_shadow_polygons()
+            # Step 3: Generate shadow polygons (or reuse them from an earlier run on the same input)
+            if not self.load_cached_polygons():
+                self.generate_shadow_polygons()
+                self.save_cached_polygons()
             
             # Step 4: Return GeoJSON
             geojson = self.get_geojson_feature_collection()
@@ -346,12 +594,13 @@ class TreeShadowGenerator:
 # Global instance for the app
 _tree_shadow_generator: Optional[TreeShadowGenerator] = None
 
-def get_tree_shadow_generator(tree_data_path: str) -> TreeShadowGenerator:
+def get_tree_shadow_generator(tree_data_path: str, polygon_mode: bool = True) -> TreeShadowGenerator:
     """
     Get or create the global TreeShadowGenerator instance.
     
     Args:
         tree_data_path: Path to tree_positions.json file
+        polygon_mode: Emit canopy polygons rather than points (used when creating the instance)
         
     Returns:
         TreeShadowGenerator instance
@@ -359,24 +608,39 @@ def get_tree_shadow_generator(tree_data_path: str) -> TreeShadowGenerator:
     global _tree_shadow_generator
     
     if _tree_shadow_generator is None:
-        _tree_shadow_generator = TreeShadowGenerator(tree_data_path)
+        _tree_shadow_generator = TreeShadowGenerator(tree_data_path, polygon_mode)
         logger.info("Created new TreeShadowGenerator instance")
     
     return _tree_shadow_generator
 
-def precompute_tree_shadows(tree_data_path: str) -> Dict[str, Any]:
+def precompute_tree_shadows(tree_data_path: str, output_path: Optional[str] = None,
+                            polygon_mode: bool = True) -> Dict[str, Any]:
     """
     Precompute tree shadows for server startup.
     
     Args:
         tree_data_path: Path to tree_positions.json file
+        output_path: If given, stream the features to this file as a GeoJSON text
+            sequence instead of keeping them in memory
+        polygon_mode: Emit canopy polygons; when False, emit Point features with
+            shadow_radius_m for client-side circles
         
     Returns:
-        GeoJSON FeatureCollection with precomputed shadows
+        GeoJSON FeatureCollection with precomputed shadows (with an empty feature
+        list and a "features_path" property when streamed to output_path)
     """
     try:
-        generator = get_tree_shadow_generator(tree_data_path)
-        return generator.process_all()
+        generator = get_tree_shadow_generator(tree_data_path, polygon_mode)
+        if output_path is None:
+            return generator.process_all()
+        
+        generator.load_tree_data()
+        generator.filter_trees_by_density()
+        with open(output_path, 'w') as f:
+            total_features = generator.stream_features(f)
+        properties = generator.get_collection_properties(total_features)
+        properties["features_path"] = output_path
+        return {"type": "FeatureCollection", "properties": properties, "features": []}
     except Exception as e:
         logger.error(f"Failed to precompute tree shadows: {e}")
         raise
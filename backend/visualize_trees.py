@@ -7,10 +7,18 @@ Usage: python visualize_trees.py [json_file] [output_html]
 """
 
 import json
-import pandas as pd
-import folium
+import numpy as np
 import sys
 import logging
+from string import Template
+from typing import Dict
+
+# Try to import orjson for faster GeoJSON serialization
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -19,75 +27,104 @@ logger = logging.getLogger(__name__)
 # Downtown Philadelphia bounding box
 PHILLY_BBOX = (39.97, 39.94, -75.15, -75.17)
 
-def load_trees_from_json(json_file: str) -> pd.DataFrame:
-    """Load tree data from JSON file."""
+# Marker (color, radius) per density tier: <= 0.3, <= 0.4, <= 0.6, <= 0.8, > 0.8
+DENSITY_TIER_BOUNDS = [0.3, 0.4, 0.6, 0.8]
+DENSITY_TIER_STYLES = [('green', 2), ('blue', 2), ('orange', 3), ('red', 4), ('darkred', 5)]
+
+# Standalone Leaflet page; the trees are embedded as GeoJSON and styled client-side,
+# so the page also works when opened straight from disk
+MAP_TEMPLATE = Template('''<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>Tree Visualization</title>
+    <link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css">
+    <script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+    <style>html, body, #map { height: 100%; margin: 0; }</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+    var trees = $trees;
+    var tierBounds = $tier_bounds;
+    var tierStyles = $tier_styles;
+
+    var map = L.map('map').setView([$center_lat, $center_lon], 16);
+    var satellite = L.tileLayer(
+        'https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
+        {attribution: 'Esri', maxZoom: 19}
+    ).addTo(map);
+    var streets = L.tileLayer('https://tile.openstreetmap.org/{z}/{x}/{y}.png', {
+        attribution: '&copy; OpenStreetMap contributors', maxZoom: 19
+    });
+
+    L.rectangle($bbox_bounds, {color: 'red', fill: false, weight: 3}).addTo(map);
+
+    var treeLayer = L.geoJSON(trees, {
+        pointToLayer: function (feature, latlng) {
+            var density = feature.properties.density;
+            var tier = 0;
+            while (tier < tierBounds.length && density > tierBounds[tier]) tier++;
+            return L.circleMarker(latlng, {
+                radius: tierStyles[tier][1], color: tierStyles[tier][0], fill: true, fillOpacity: 0.8
+            });
+        },
+        onEachFeature: function (feature, layer) {
+            layer.bindPopup('Tree ' + feature.properties.id + '<br>Density: ' +
+                feature.properties.density.toFixed(3) + '<br>Grid: 5m');
+        }
+    }).addTo(map);
+
+    L.control.layers({'Satellite': satellite, 'Street Map': streets}, {'Trees': treeLayer}).addTo(map);
+</script>
+</body>
+</html>
+''')
+
+def load_trees_from_json(json_file: str) -> Dict[str, np.ndarray]:
+    """Load tree data from JSON file as latitude/longitude/density arrays."""
     with open(json_file, 'r') as f:
         data = json.load(f)
     
-    trees = []
-    for tree in data['trees']:
-        trees.append({
-            'latitude': tree['latitude'],
-            'longitude': tree['longitude'],
-            'density': tree['density'],
-            'source': 'loaded_from_json'
-        })
-    
-    return pd.DataFrame(trees)
+    trees = data['trees']
+    return {
+        key: np.array([tree[key] for tree in trees], dtype=float)
+        for key in ('latitude', 'longitude', 'density')
+    }
 
-def create_tree_visualization(trees_df: pd.DataFrame, output_file: str = 'tree_visualization.html') -> None:
+def trees_to_geojson(trees: Dict[str, np.ndarray]) -> str:
+    """Serialize the trees as a GeoJSON FeatureCollection of points with id/density properties."""
+    features = [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+            'properties': {'id': idx, 'density': density}
+        }
+        for idx, (lat, lon, density) in enumerate(zip(
+            trees['latitude'].tolist(), trees['longitude'].tolist(), trees['density'].tolist()
+        ))
+    ]
+    collection = {'type': 'FeatureCollection', 'features': features}
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(collection).decode('utf-8')
+    return json.dumps(collection, separators=(',', ':'))
+
+def create_tree_visualization(trees: Dict[str, np.ndarray], output_file: str = 'tree_visualization.html') -> None:
     """Create a visualization of the trees."""
-    logger.info(f"Creating visualization for {len(trees_df)} trees...")
-    
-    # Create map centered on downtown Philadelphia
-    center_lat = (PHILLY_BBOX[0] + PHILLY_BBOX[1]) / 2
-    center_lon = (PHILLY_BBOX[2] + PHILLY_BBOX[3]) / 2
-    
-    m = folium.Map(location=[center_lat, center_lon], zoom_start=16, tiles=None)
-    
-    # Add satellite and street map layers
-    folium.TileLayer(
-        tiles='https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
-        attr='Esri', 
-        name='Satellite'
-    ).add_to(m)
-    folium.TileLayer(tiles='OpenStreetMap', name='Street Map').add_to(m)
+    logger.info(f"Creating visualization for {len(trees['density'])} trees...")
     
-    # Add bounding box rectangle
-    folium.Rectangle(
-        bounds=[[PHILLY_BBOX[1], PHILLY_BBOX[3]], [PHILLY_BBOX[0], PHILLY_BBOX[2]]], 
-        color='red', 
-        fill=False, 
-        weight=3
-    ).add_to(m)
-    
-    # Add trees with density-based coloring
-    for idx, tree in trees_df.iterrows():
-        density = tree['density']
-        
-        # Color-code by density
-        if density > 0.8:
-            color, size = 'darkred', 5
-        elif density > 0.6:
-            color, size = 'red', 4
-        elif density > 0.4:
-            color, size = 'orange', 3
-        elif density > 0.3:
-            color, size = 'blue', 2
-        else:
-            color, size = 'green', 2
-        
-        folium.CircleMarker(
-            location=[tree['latitude'], tree['longitude']],
-            radius=size,
-            popup=f"Tree {idx}<br>Density: {density:.3f}<br>Grid: 5m",
-            color=color,
-            fill=True,
-            fillOpacity=0.8
-        ).add_to(m)
+    # Map centered on downtown Philadelphia, with the bounding box outlined
+    html = MAP_TEMPLATE.substitute(
+        trees=trees_to_geojson(trees),
+        tier_bounds=json.dumps(DENSITY_TIER_BOUNDS),
+        tier_styles=json.dumps(DENSITY_TIER_STYLES),
+        center_lat=(PHILLY_BBOX[0] + PHILLY_BBOX[1]) / 2,
+        center_lon=(PHILLY_BBOX[2] + PHILLY_BBOX[3]) / 2,
+        bbox_bounds=json.dumps([[PHILLY_BBOX[1], PHILLY_BBOX[3]], [PHILLY_BBOX[0], PHILLY_BBOX[2]]])
+    )
     
-    folium.LayerControl().add_to(m)
-    m.save(output_file)
+    with open(output_file, 'w') as f:
+        f.write(html)
     logger.info(f"Tree visualization saved to {output_file}")
 
 def main():
@@ -98,14 +135,14 @@ def main():
     
     try:
         # Load tree data
-        trees_df = load_trees_from_json(json_file)
-        logger.info(f"Loaded {len(trees_df)} trees from {json_file}")
+        trees = load_trees_from_json(json_file)
+        logger.info(f"Loaded {len(trees['density'])} trees from {json_file}")
         
         # Create visualization
-        create_tree_visualization(trees_df, output_file)
+        create_tree_visualization(trees, output_file)
         
         print(f"\n✓ Visualization complete!")
-        print(f"  - Trees loaded: {len(trees_df)}")
+        print(f"  - Trees loaded: {len(trees['density'])}")
         print(f"  - Output file: {output_file}")
         print(f"  - Open the HTML file in your browser to view the map")
         
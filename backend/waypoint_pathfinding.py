@@ -7,17 +7,40 @@ from OpenStreetMap for the PennApps tree routing project.
 Author: PennApps 2025 Team
 """
 
-import osmnx as ox
 import networkx as nx
 import matplotlib.pyplot as plt
 import pickle
+import hashlib
+from itertools import chain
 import json
+import os
+import threading
+import time
 from pyproj import Geod
+from string import Template
 from typing import List, Tuple, Dict, Any, Optional
+import numpy as np
 import pandas as pd
+import geopandas as gpd
+import shapely
+import requests
 import folium
 import logging
 
+# Try to import orjson for faster JSON output
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Try to import pyarrow for optional GeoParquet output
+try:
+    import pyarrow
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -31,12 +54,160 @@ STORE_TAGS = {
     'shop': ['convenience', 'supermarket', 'grocery', 'beverages']
 }
 
+# Both waypoint kinds, so they can be fetched with a single Overpass query
+WAYPOINT_TAGS = {**WATER_TAGS, **STORE_TAGS}
+
+# OSM tags kept on fetched waypoints (all others are dropped right after download);
+# the detail tags are optional in the extracted waypoint records
+WAYPOINT_DETAIL_FIELDS = ['opening_hours', 'website', 'phone']
+WAYPOINT_FIELDS = ['name', 'amenity', 'shop'] + WAYPOINT_DETAIL_FIELDS
+
 # Downtown Philadelphia bounding box (focused area)
 PHILLY_BBOX = (39.97, 39.94, -75.15, -75.17)  # (north, south, east, west)
 
-# Configure OSMnx
-ox.settings.use_cache = True
-ox.settings.log_console = False
+# UTM zone 18N, a metric CRS for planar distances around Philadelphia
+UTM_CRS = 'EPSG:32618'
+
+EARTH_RADIUS_KM = 6371.0088  # mean Earth radius, for haversine distances
+
+# Overpass API endpoint, queried directly for the waypoint nodes
+OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+OVERPASS_TIMEOUT = 25  # seconds, server-side query timeout
+OVERPASS_MIN_INTERVAL = 1.0  # seconds between live requests (Overpass usage policy)
+
+# Overpass responses (by query) and processed waypoints (by bbox and tags) cached on disk
+OVERPASS_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.overpass_cache')
+OVERPASS_CACHE_TTL = 24 * 3600  # seconds
+
+_overpass_lock = threading.Lock()
+_last_overpass_request = 0.0
+
+
+def _overpass_post(query: str) -> bytes:
+    """
+    Run an Overpass query and return the raw JSON response.
+    
+    Repeated queries are served from the on-disk cache until it expires; live requests
+    are started at least OVERPASS_MIN_INTERVAL seconds apart.
+    """
+    global _last_overpass_request
+    cache_path = os.path.join(OVERPASS_CACHE_DIR, f"{hashlib.md5(query.encode()).hexdigest()}.json")
+    try:
+        if time.time() - os.path.getmtime(cache_path) <= OVERPASS_CACHE_TTL:
+            with open(cache_path, 'rb') as f:
+                content = f.read()
+            logger.info(f"Loaded cached Overpass response from {cache_path}")
+            return content
+    except OSError:
+        pass
+    
+    with _overpass_lock:
+        wait = OVERPASS_MIN_INTERVAL - (time.monotonic() - _last_overpass_request)
+        if wait > 0:
+            time.sleep(wait)
+        _last_overpass_request = time.monotonic()
+    response = requests.post(OVERPASS_URL, data={'data': query}, timeout=OVERPASS_TIMEOUT + 5)
+    response.raise_for_status()
+    content = response.content
+    
+    # A failed write only costs the next run a refetch
+    tmp_path = f"{cache_path}.tmp"
+    try:
+        os.makedirs(OVERPASS_CACHE_DIR, exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"Could not write Overpass cache {cache_path}: {e}")
+    return content
+
+
+def _json_default(obj: Any) -> Any:
+    """json.dump fallback for the NumPy coordinate arrays in the columnar output."""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in km between broadcastable arrays of lat/lon degrees."""
+    lat1, lon1, lat2, lon2 = (np.radians(a) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+# Marker popup HTML for create_map, filled from the waypoint dicts with str.format_map
+WATER_POPUP_TEMPLATE = """
+            <b>Water Fountain</b><br>
+            Name: {name}<br>
+            Type: {amenity}<br>
+            Coordinates: {latitude:.6f}, {longitude:.6f}
+            """
+STORE_POPUP_TEMPLATE = """
+            <b>Store</b><br>
+            Name: {name}<br>
+            Type: {shop}<br>
+            Coordinates: {latitude:.6f}, {longitude:.6f}
+            """
+
+
+# Standalone Leaflet page for exported waypoint maps; the waypoints are embedded as
+# GeoJSON and turned into markers client-side
+WAYPOINT_MAP_TEMPLATE = Template('''<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>Waypoints</title>
+    <link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css">
+    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/Leaflet.awesome-markers/2.0.2/leaflet.awesome-markers.css">
+    <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/@fortawesome/fontawesome-free@6.2.0/css/all.min.css">
+    <script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+    <script src="https://cdnjs.cloudflare.com/ajax/libs/Leaflet.awesome-markers/2.0.2/leaflet.awesome-markers.js"></script>
+    <style>html, body, #map { height: 100%; margin: 0; }</style>
+</head>
+<body>
+<div id="map"></div>
+<div style="position: fixed; 
+     bottom: 50px; left: 50px; width: 200px; height: 120px; 
+     background-color: white; border:2px solid grey; z-index:9999; 
+     font-size:14px; padding: 10px">
+<p><b>Waypoints Found</b></p>
+<p><i class="fa fa-tint" style="color:blue"></i> Water Fountains: $water_count</p>
+<p><i class="fa fa-shopping-cart" style="color:green"></i> Stores: $store_count</p>
+<p><b>Total: $total_count</b></p>
+</div>
+<script>
+    var water = $water;
+    var stores = $stores;
+
+    var map = L.map('map').setView([$center_lat, $center_lon], 16);
+    L.tileLayer('https://tile.openstreetmap.org/{z}/{x}/{y}.png', {
+        attribution: '&copy; OpenStreetMap contributors', maxZoom: 19
+    }).addTo(map);
+    L.polyline($bbox_coords, {color: 'red', weight: 3, opacity: 0.8}).bindPopup('Search Area').addTo(map);
+
+    function addWaypoints(data, title, label, color, icon) {
+        L.geoJSON(data, {
+            pointToLayer: function (feature, latlng) {
+                return L.marker(latlng, {
+                    icon: L.AwesomeMarkers.icon({markerColor: color, iconColor: 'white', icon: icon, prefix: 'fa'})
+                });
+            },
+            onEachFeature: function (feature, layer) {
+                var p = feature.properties;
+                var c = feature.geometry.coordinates;
+                layer.bindPopup('<b>' + title + '</b><br>Name: ' + p.name + '<br>Type: ' + p.kind +
+                    '<br>Coordinates: ' + c[1].toFixed(6) + ', ' + c[0].toFixed(6), {maxWidth: 200});
+                layer.bindTooltip(label + ': ' + p.name);
+            }
+        }).addTo(map);
+    }
+    addWaypoints(water, 'Water Fountain', 'Water', 'blue', 'tint');
+    addWaypoints(stores, 'Store', 'Store', 'green', 'shopping-cart');
+</script>
+</body>
+</html>
+''')
 
 
 class WaypointFetcher:
@@ -52,14 +223,54 @@ class WaypointFetcher:
         self.bbox = bbox
         self.north, self.south, self.east, self.west = bbox
         
+    def overpass_query(self, tags: Dict[str, List[str]]) -> str:
+        """
+        Build the Overpass QL query for the nodes in the bounding box matching any of the tags.
+        
+        Args:
+            tags: OSM tag filter, e.g. {'shop': ['convenience', 'supermarket']}
+            
+        Returns:
+            Overpass QL query string
+        """
+        area = f"({self.south},{self.west},{self.north},{self.east})"
+        clauses = "".join(
+            f'node["{key}"~"^({"|".join(values)})$"]{area};' for key, values in tags.items()
+        )
+        return f"[out:json][timeout:{OVERPASS_TIMEOUT}];({clauses});out;"
+    
+    def fetch_features(self, tags: Dict[str, List[str]]) -> gpd.GeoDataFrame:
+        """
+        Fetch the nodes matching the tags straight from the Overpass API.
+        
+        Waypoints are points, so only nodes are requested and their coordinates are used
+        as-is instead of having OSMnx rebuild geometries for every element.
+        
+        Args:
+            tags: OSM tag filter
+            
+        Returns:
+            GeoDataFrame with one column per WAYPOINT_FIELDS tag present, indexed like
+            OSMnx by (element_type, osmid)
+        """
+        elements = json.loads(_overpass_post(self.overpass_query(tags))).get('elements', [])
+        nodes = [el for el in elements if el.get('type') == 'node']
+        
+        index = pd.MultiIndex.from_arrays(
+            [['node'] * len(nodes), [el['id'] for el in nodes]], names=['element_type', 'osmid']
+        )
+        return gpd.GeoDataFrame(
+            [{key: value for key, value in el.get('tags', {}).items() if key in WAYPOINT_FIELDS} for el in nodes],
+            index=index,
+            geometry=gpd.points_from_xy([el['lon'] for el in nodes], [el['lat'] for el in nodes]),
+            crs='EPSG:4326'
+        )
+    
     def fetch_water_fountains(self) -> pd.DataFrame:
         """Fetch water fountains from OpenStreetMap."""
         logger.info("Fetching water fountains...")
         try:
-            water_gdf = ox.features_from_bbox(
-                bbox=(self.west, self.south, self.east, self.north), 
-                tags=WATER_TAGS
-            )
+            water_gdf = self.fetch_features(WATER_TAGS)
             logger.info(f"Found {len(water_gdf)} water fountains")
             return water_gdf
         except Exception as e:
@@ -70,81 +281,162 @@ class WaypointFetcher:
         """Fetch stores from OpenStreetMap."""
         logger.info("Fetching stores...")
         try:
-            store_gdf = ox.features_from_bbox(
-                bbox=(self.west, self.south, self.east, self.north), 
-                tags=STORE_TAGS
-            )
+            store_gdf = self.fetch_features(STORE_TAGS)
             logger.info(f"Found {len(store_gdf)} stores")
             return store_gdf
         except Exception as e:
             logger.error(f"Error fetching stores: {e}")
             return pd.DataFrame()
+    
+    def fetch_waypoints(self, raise_errors: bool = False) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Fetch water fountains and stores with one OpenStreetMap query.
+        
+        Args:
+            raise_errors: Re-raise fetch errors instead of returning empty frames
+        
+        Returns:
+            Tuple of (water_gdf, store_gdf), as fetch_water_fountains/fetch_stores return them
+        """
+        logger.info("Fetching water fountains and stores...")
+        try:
+            waypoint_gdf = self.fetch_features(WAYPOINT_TAGS)
+        except Exception as e:
+            logger.error(f"Error fetching waypoints: {e}")
+            if raise_errors:
+                raise
+            return pd.DataFrame(), pd.DataFrame()
+        
+        water_gdf = self._select_tagged(waypoint_gdf, WATER_TAGS)
+        store_gdf = self._select_tagged(waypoint_gdf, STORE_TAGS)
+        logger.info(f"Found {len(water_gdf)} water fountains")
+        logger.info(f"Found {len(store_gdf)} stores")
+        return water_gdf, store_gdf
+    
+    @staticmethod
+    def _select_tagged(gdf: pd.DataFrame, tags: Dict[str, List[str]]) -> pd.DataFrame:
+        """Rows of gdf matching any of tags, without the columns only other rows use."""
+        mask = pd.Series(False, index=gdf.index)
+        for key, values in tags.items():
+            if key in gdf.columns:
+                mask |= gdf[key].isin(values)
+        # A separate query would not have produced tag columns that are empty for these rows
+        return gdf[mask].dropna(axis=1, how='all')
 
 
 class WaypointProcessor:
     """Processes waypoint data into structured format."""
     
     @staticmethod
-    def extract_waypoint_data(gdf: pd.DataFrame, waypoint_type: str) -> List[Dict[str, Any]]:
+    def extract_waypoint_frame(gdf: pd.DataFrame, waypoint_type: str, details: bool = True) -> pd.DataFrame:
+        """
+        Extract waypoint data from GeoDataFrame as one row per waypoint with typed columns.
+        
+        Args:
+            gdf: GeoDataFrame containing waypoint data
+            waypoint_type: Type of waypoint ('water' or 'store')
+            details: Include the WAYPOINT_DETAIL_FIELDS (opening hours, website, phone)
+            
+        Returns:
+            DataFrame with id/type/name/amenity/shop (and detail) string columns and
+            float64 longitude/latitude columns
+        """
+        fields = WAYPOINT_FIELDS if details else WAYPOINT_FIELDS[:3]
+        if gdf.empty or 'geometry' not in gdf.columns:
+            return pd.DataFrame(columns=['id', 'type', 'name', 'longitude', 'latitude', *fields[1:]]).astype(
+                {'longitude': np.float64, 'latitude': np.float64}
+            )
+        
+        # Non-empty points; every MultiPoint contributes one waypoint per part (kept in row order)
+        geometries = gdf.geometry
+        points = gdf[geometries.geom_type.isin(['Point', 'MultiPoint']) & ~geometries.is_empty]
+        is_multi = (points.geometry.geom_type == 'MultiPoint').to_numpy()
+        
+        # All point coordinates in one GEOS call; rows/parts map each coordinate back to its row
+        geoms = points.geometry.values
+        coords = shapely.get_coordinates(geoms)
+        counts = shapely.get_num_coordinates(geoms)
+        rows = np.repeat(np.arange(len(points)), counts)
+        parts = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+        
+        # IDs: '<type>_<index>' for points, '<type>_<index>_<part>' for MultiPoint parts
+        ids = [
+            f"{waypoint_type}_{idx}_{part}" if multi else f"{waypoint_type}_{idx}"
+            for idx, part, multi in zip(points.index[rows], parts.tolist(), is_multi[rows].tolist())
+        ]
+        
+        # Attribute columns as plain lists of str ('' for missing tags, not 'nan')
+        attrs = points.reindex(columns=fields).astype('string').fillna('')
+        columns = {col: attrs[col].to_numpy(dtype=object)[rows].tolist() for col in fields}
+        
+        # Handle missing name column gracefully
+        names = [
+            name or amenity or shop or waypoint_id
+            for waypoint_id, name, amenity, shop in zip(ids, columns['name'], columns['amenity'], columns['shop'])
+        ]
+        
+        return pd.DataFrame({
+            'id': ids,
+            'type': [waypoint_type] * len(ids),
+            'name': names,
+            'longitude': coords[:, 0],
+            'latitude': coords[:, 1],
+            **{col: columns[col] for col in fields[1:]}
+        })
+    
+    @staticmethod
+    def extract_waypoint_data(gdf: pd.DataFrame, waypoint_type: str, details: bool = True) -> List[Dict[str, Any]]:
         """
         Extract waypoint data from GeoDataFrame into structured format.
         
         Args:
             gdf: GeoDataFrame containing waypoint data
             waypoint_type: Type of waypoint ('water' or 'store')
+            details: Include the WAYPOINT_DETAIL_FIELDS (opening hours, website, phone)
             
         Returns:
             List of dictionaries containing waypoint information
         """
-        waypoints = []
-        for idx, row in gdf.iterrows():
-            geom = row.geometry
-            if geom and not geom.is_empty:
-                if geom.geom_type == 'Point':
-                    lon, lat = geom.x, geom.y
-                    # Handle missing name column gracefully
-                    name = (row.get('name', None) or 
-                           row.get('amenity', None) or 
-                           row.get('shop', None) or 
-                           f'{waypoint_type}_{idx}')
-                    
-                    waypoint_data = {
-                        'id': f"{waypoint_type}_{idx}",
-                        'type': waypoint_type,
-                        'name': str(name),
-                        'coordinates': [lat, lon],  # [lat, lng] for frontend compatibility
-                        'longitude': lon,
-                        'latitude': lat,
-                        'amenity': str(row.get('amenity', '')),
-                        'shop': str(row.get('shop', '')),
-                        'opening_hours': str(row.get('opening_hours', '')),
-                        'website': str(row.get('website', '')),
-                        'phone': str(row.get('phone', ''))
-                    }
-                    waypoints.append(waypoint_data)
-                    
-                elif geom.geom_type == 'MultiPoint':
-                    for i, point in enumerate(geom.geoms):
-                        lon, lat = point.x, point.y
-                        name = (row.get('name', None) or 
-                               row.get('amenity', None) or 
-                               row.get('shop', None) or 
-                               f'{waypoint_type}_{idx}_{i}')
-                        
-                        waypoint_data = {
-                            'id': f"{waypoint_type}_{idx}_{i}",
-                            'type': waypoint_type,
-                            'name': str(name),
-                            'coordinates': [lat, lon],
-                            'longitude': lon,
-                            'latitude': lat,
-                            'amenity': str(row.get('amenity', '')),
-                            'shop': str(row.get('shop', '')),
-                            'opening_hours': str(row.get('opening_hours', '')),
-                            'website': str(row.get('website', '')),
-                            'phone': str(row.get('phone', ''))
-                        }
-                        waypoints.append(waypoint_data)
+        frame = WaypointProcessor.extract_waypoint_frame(gdf, waypoint_type, details)
+        return WaypointProcessor.frame_to_records(frame)
+    
+    @staticmethod
+    def frame_to_records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+        """
+        Convert an extract_waypoint_frame result into the per-waypoint dict format.
+        
+        Args:
+            frame: DataFrame returned by extract_waypoint_frame
+            
+        Returns:
+            List of dictionaries containing waypoint information
+        """
+        lons = frame['longitude'].tolist()
+        lats = frame['latitude'].tolist()
+        waypoints = [
+            {
+                'id': waypoint_id,
+                'type': waypoint_type,
+                'name': name,
+                'coordinates': [lat, lon],  # [lat, lng] for frontend compatibility
+                'longitude': lon,
+                'latitude': lat,
+                'amenity': amenity,
+                'shop': shop
+            }
+            for waypoint_id, waypoint_type, name, lon, lat, amenity, shop in zip(
+                frame['id'].tolist(), frame['type'].tolist(), frame['name'].tolist(),
+                lons, lats, frame['amenity'].tolist(), frame['shop'].tolist()
+            )
+        ]
+        
+        if 'phone' in frame.columns:
+            for waypoint, opening_hours, website, phone in zip(
+                waypoints, frame['opening_hours'].tolist(), frame['website'].tolist(), frame['phone'].tolist()
+            ):
+                waypoint['opening_hours'] = opening_hours
+                waypoint['website'] = website
+                waypoint['phone'] = phone
         return waypoints
 
 
@@ -161,6 +453,28 @@ class WaypointVisualizer:
         self.bbox = bbox
         self.north, self.south, self.east, self.west = bbox
         
+    @staticmethod
+    def _add_marker_layer(philly_map: folium.Map, waypoints: List[Dict], popups: List[str],
+                          tooltips: List[str], name: str, icon: folium.Icon) -> None:
+        """Add waypoints as one GeoJson layer of icon markers instead of one folium.Marker each."""
+        if not waypoints:
+            return
+        features = [
+            {
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [wp['longitude'], wp['latitude']]},
+                'properties': {'popup': popup_text, 'tooltip': tooltip}
+            }
+            for wp, popup_text, tooltip in zip(waypoints, popups, tooltips)
+        ]
+        folium.GeoJson(
+            {'type': 'FeatureCollection', 'features': features},
+            name=name,
+            marker=folium.Marker(icon=icon),
+            popup=folium.GeoJsonPopup(fields=['popup'], labels=False, maxWidth=200),
+            tooltip=folium.GeoJsonTooltip(fields=['tooltip'], labels=False)
+        ).add_to(philly_map)
+    
     def create_map(self, water_waypoints: List[Dict], store_waypoints: List[Dict], 
                    output_file: str = 'waypoints_map.html') -> folium.Map:
         """
@@ -202,49 +516,25 @@ class WaypointVisualizer:
             popup='Search Area'
         ).add_to(philly_map)
         
+        # Popup HTML for every waypoint, built in one pass before any marker is created
+        water_popups = [WATER_POPUP_TEMPLATE.format_map(wp) for wp in water_waypoints]
+        store_popups = [STORE_POPUP_TEMPLATE.format_map(wp) for wp in store_waypoints]
+        
         # Add water fountains
-        water_count = 0
-        for wp in water_waypoints:
-            lat, lon = wp['latitude'], wp['longitude']
-            name = wp['name']
-            amenity = wp['amenity']
-            
-            popup_text = f"""
-            <b>Water Fountain</b><br>
-            Name: {name}<br>
-            Type: {amenity}<br>
-            Coordinates: {lat:.6f}, {lon:.6f}
-            """
-            
-            folium.Marker(
-                [lat, lon],
-                popup=folium.Popup(popup_text, max_width=200),
-                icon=folium.Icon(color='blue', icon='tint', prefix='fa'),
-                tooltip=f"Water: {name}"
-            ).add_to(philly_map)
-            water_count += 1
+        self._add_marker_layer(
+            philly_map, water_waypoints, water_popups,
+            [f"Water: {wp['name']}" for wp in water_waypoints],
+            'Water Fountains', folium.Icon(color='blue', icon='tint', prefix='fa')
+        )
+        water_count = len(water_waypoints)
         
         # Add stores
-        store_count = 0
-        for wp in store_waypoints:
-            lat, lon = wp['latitude'], wp['longitude']
-            name = wp['name']
-            shop_type = wp['shop']
-            
-            popup_text = f"""
-            <b>Store</b><br>
-            Name: {name}<br>
-            Type: {shop_type}<br>
-            Coordinates: {lat:.6f}, {lon:.6f}
-            """
-            
-            folium.Marker(
-                [lat, lon],
-                popup=folium.Popup(popup_text, max_width=200),
-                icon=folium.Icon(color='green', icon='shopping-cart', prefix='fa'),
-                tooltip=f"Store: {name}"
-            ).add_to(philly_map)
-            store_count += 1
+        self._add_marker_layer(
+            philly_map, store_waypoints, store_popups,
+            [f"Store: {wp['name']}" for wp in store_waypoints],
+            'Stores', folium.Icon(color='green', icon='shopping-cart', prefix='fa')
+        )
+        store_count = len(store_waypoints)
         
         # Add legend
         legend_html = f'''
@@ -266,6 +556,53 @@ class WaypointVisualizer:
         logger.info(f"Map created with {water_count} water fountains and {store_count} stores")
         
         return philly_map
+    
+    @staticmethod
+    def _waypoints_geojson(waypoints: List[Dict], kind_field: str) -> str:
+        """Waypoints as a GeoJSON FeatureCollection string that is safe to embed in a <script>."""
+        collection = {
+            'type': 'FeatureCollection',
+            'features': [
+                {
+                    'type': 'Feature',
+                    'geometry': {'type': 'Point', 'coordinates': [wp['longitude'], wp['latitude']]},
+                    'properties': {'name': wp['name'], 'kind': wp[kind_field]}
+                }
+                for wp in waypoints
+            ]
+        }
+        text = orjson.dumps(collection).decode('utf-8') if ORJSON_AVAILABLE else json.dumps(collection)
+        return text.replace('</', '<\\/')
+    
+    def export_map(self, water_waypoints: List[Dict], store_waypoints: List[Dict], 
+                   output_file: str = 'waypoints_map.html') -> None:
+        """
+        Write the waypoint map as a standalone Leaflet page, without building folium objects.
+        
+        Shows the same search area, markers, popups and legend as create_map.
+        
+        Args:
+            water_waypoints: List of water fountain waypoints
+            store_waypoints: List of store waypoints
+            output_file: Output file path for the map
+        """
+        logger.info("Exporting map of all waypoints...")
+        html = WAYPOINT_MAP_TEMPLATE.substitute(
+            water=self._waypoints_geojson(water_waypoints, 'amenity'),
+            stores=self._waypoints_geojson(store_waypoints, 'shop'),
+            water_count=len(water_waypoints),
+            store_count=len(store_waypoints),
+            total_count=len(water_waypoints) + len(store_waypoints),
+            center_lat=(self.north + self.south) / 2,
+            center_lon=(self.east + self.west) / 2,
+            bbox_coords=json.dumps([
+                [self.south, self.west], [self.north, self.west], [self.north, self.east],
+                [self.south, self.east], [self.south, self.west]
+            ])
+        )
+        with open(output_file, 'w') as f:
+            f.write(html)
+        logger.info(f"Map saved to {output_file}")
 
 
 class WaypointManager:
@@ -279,32 +616,213 @@ class WaypointManager:
             bbox: Bounding box as (north, south, east, west)
         """
         self.bbox = bbox
+        
+        # Geodesic area of the bounding box, reported in the saved metadata
+        north, south, east, west = bbox
+        area_m2, _ = Geod(ellps='WGS84').polygon_area_perimeter(
+            [west, east, east, west], [south, south, north, north]
+        )
+        self._area_km2 = abs(area_m2) / 1e6
+        
         self.fetcher = WaypointFetcher(bbox)
         self.processor = WaypointProcessor()
         self.visualizer = WaypointVisualizer(bbox)
         
-    def fetch_all_waypoints(self) -> Tuple[List[Dict], List[Dict]]:
+        # Point GeoDataFrames of the last fetched waypoints, empty until fetch_all_waypoints/run
+        self._index_waypoints(self._waypoints_gdf([], []))
+        
+    def _index_waypoints(self, waypoint_gdf: gpd.GeoDataFrame) -> None:
+        """Keep the waypoint GeoDataFrame and its UTM projection, used by the spatial queries."""
+        self._gdf = waypoint_gdf
+        self._utm_gdf = waypoint_gdf.to_crs(UTM_CRS)
+        
+    @staticmethod
+    def _waypoints_gdf(water_waypoints: List[Dict], store_waypoints: List[Dict]) -> gpd.GeoDataFrame:
+        """Water then store waypoints as one GeoDataFrame; Point geometry replaces the coordinate fields."""
+        all_waypoints = list(chain(water_waypoints, store_waypoints))
+        return gpd.GeoDataFrame(
+            pd.DataFrame(all_waypoints).drop(columns=['coordinates', 'latitude', 'longitude'], errors='ignore'),
+            geometry=gpd.points_from_xy(
+                [wp['longitude'] for wp in all_waypoints], [wp['latitude'] for wp in all_waypoints]
+            ),
+            crs='EPSG:4326'
+        )
+    
+    def _waypoint_cache_path(self) -> str:
+        """Cache file for the processed waypoints of this bbox and tag configuration."""
+        key = hashlib.blake2b(repr((self.bbox, WATER_TAGS, STORE_TAGS, WAYPOINT_FIELDS)).encode()).hexdigest()[:16]
+        return os.path.join(OVERPASS_CACHE_DIR, f"waypoints_{key}.json")
+    
+    def fetch_all_waypoints(self, use_cache: bool = True) -> Tuple[List[Dict], List[Dict]]:
         """
         Fetch all waypoints (water fountains and stores).
         
+        Args:
+            use_cache: Reuse the processed waypoints of a previous run for the same bbox
+                and tags while they are younger than OVERPASS_CACHE_TTL
+        
         Returns:
             Tuple of (water_waypoints, store_waypoints)
         """
-        # Fetch raw data
-        water_gdf = self.fetcher.fetch_water_fountains()
-        store_gdf = self.fetcher.fetch_stores()
+        cache_path = self._waypoint_cache_path()
+        cached = None
+        if use_cache:
+            try:
+                if time.time() - os.path.getmtime(cache_path) <= OVERPASS_CACHE_TTL:
+                    with open(cache_path, 'rb') as f:
+                        cached = json.loads(f.read())
+            except (OSError, ValueError):
+                cached = None
         
-        # Process data
-        water_waypoints = self.processor.extract_waypoint_data(water_gdf, 'water')
-        store_waypoints = self.processor.extract_waypoint_data(store_gdf, 'store')
+        if cached is not None:
+            water_waypoints, store_waypoints = cached['water_fountains'], cached['stores']
+            logger.info(f"Loaded cached waypoints from {cache_path}")
+        else:
+            # Fetch raw data (both kinds in one request); a failed fetch yields no waypoints
+            # and is not cached, so the next run retries
+            try:
+                water_gdf, store_gdf = self.fetcher.fetch_waypoints(raise_errors=True)
+                fetched = True
+            except Exception:
+                water_gdf, store_gdf = pd.DataFrame(), pd.DataFrame()
+                fetched = False
+            
+            # Process data
+            water_waypoints = self.processor.extract_waypoint_data(water_gdf, 'water')
+            store_waypoints = self.processor.extract_waypoint_data(store_gdf, 'store')
+            
+            if fetched:
+                # A failed write only costs the next run a refetch
+                tmp_path = f"{cache_path}.tmp"
+                try:
+                    os.makedirs(OVERPASS_CACHE_DIR, exist_ok=True)
+                    with open(tmp_path, 'w') as f:
+                        json.dump({'water_fountains': water_waypoints, 'stores': store_waypoints}, f)
+                    os.replace(tmp_path, cache_path)
+                except OSError as e:
+                    logger.warning(f"Could not write waypoint cache {cache_path}: {e}")
         
         logger.info(f"Extracted {len(water_waypoints)} water waypoints")
         logger.info(f"Extracted {len(store_waypoints)} store waypoints")
         
+        self._index_waypoints(self._waypoints_gdf(water_waypoints, store_waypoints))
+        
         return water_waypoints, store_waypoints
     
+    def filter_along(self, route_polygon) -> gpd.GeoDataFrame:
+        """
+        Select the fetched waypoints that lie within a polygon, e.g. a buffered route.
+        
+        Uses a spatial join, so the point-in-polygon tests run against an STRtree index
+        instead of a Python loop over the waypoints.
+        
+        Args:
+            route_polygon: Shapely (Multi)Polygon in lon/lat (EPSG:4326)
+            
+        Returns:
+            GeoDataFrame of the waypoints within the polygon
+        """
+        area = gpd.GeoDataFrame(geometry=[route_polygon], crs='EPSG:4326')
+        return gpd.sjoin(self._gdf, area, predicate='within').drop(columns='index_right')
+    
+    def distances_m(self, lats, lons) -> np.ndarray:
+        """
+        Planar distances in meters from every fetched waypoint to each query point.
+        
+        Both sides are projected to UTM zone 18N, where straight-line distance is within
+        about a meter of the geodesic one across the city.
+        
+        Args:
+            lats: Query point latitude(s)
+            lons: Query point longitude(s)
+            
+        Returns:
+            Array of shape (n_waypoints, n_points)
+        """
+        points = gpd.GeoSeries(gpd.points_from_xy(np.atleast_1d(lons), np.atleast_1d(lats)), crs='EPSG:4326')
+        points = points.to_crs(UTM_CRS)
+        x0, y0 = points.x.to_numpy(), points.y.to_numpy()
+        xs, ys = self._utm_gdf.geometry.x.to_numpy(), self._utm_gdf.geometry.y.to_numpy()
+        return np.hypot(xs[:, None] - x0, ys[:, None] - y0)
+    
+    def pairwise_distances(self, other_lats, other_lons) -> np.ndarray:
+        """
+        Great-circle distances in km from every fetched waypoint to each other point.
+        
+        Args:
+            other_lats: Latitudes of the other points (e.g. route nodes)
+            other_lons: Longitudes of the other points
+            
+        Returns:
+            Array of shape (n_waypoints, n_points)
+        """
+        lats, lons = self._gdf.geometry.y.to_numpy(), self._gdf.geometry.x.to_numpy()
+        other_lats = np.atleast_1d(np.asarray(other_lats, dtype=np.float64))
+        other_lons = np.atleast_1d(np.asarray(other_lons, dtype=np.float64))
+        return haversine_km(lats[:, None], lons[:, None], other_lats[None, :], other_lons[None, :])
+    
+    def _metadata(self, water_count: int, store_count: int) -> Dict[str, Any]:
+        """Metadata block of the saved waypoint files."""
+        return {
+            'total_waypoints': water_count + store_count,
+            'water_fountains': water_count,
+            'stores': store_count,
+            'bounding_box': {
+                'north': self.bbox[0],
+                'south': self.bbox[1],
+                'east': self.bbox[2],
+                'west': self.bbox[3]
+            },
+            'area_km2': self._area_km2
+        }
+    
+    def run(self, output_file: str = 'waypoints_columns.json') -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Fetch, process and save the waypoints in one pass, without per-waypoint dicts.
+        
+        The JSON file holds the metadata plus one object of parallel column arrays per
+        waypoint kind (id, type, name, longitude, latitude, amenity, shop, details).
+        
+        Args:
+            output_file: Output file path
+            
+        Returns:
+            Tuple of (water_frame, store_frame) as returned by extract_waypoint_frame
+        """
+        water_gdf, store_gdf = self.fetcher.fetch_waypoints()
+        water_frame = self.processor.extract_waypoint_frame(water_gdf, 'water')
+        store_frame = self.processor.extract_waypoint_frame(store_gdf, 'store')
+        
+        def frame_columns(frame: pd.DataFrame) -> Dict[str, Any]:
+            return {
+                col: frame[col].to_numpy(dtype=np.float64) if col in ('longitude', 'latitude') else frame[col].tolist()
+                for col in frame.columns
+            }
+        
+        waypoint_data = {
+            'metadata': self._metadata(len(water_frame), len(store_frame)),
+            'water_fountains': frame_columns(water_frame),
+            'stores': frame_columns(store_frame)
+        }
+        
+        if ORJSON_AVAILABLE:
+            with open(output_file, 'wb') as f:
+                f.write(orjson.dumps(waypoint_data, option=orjson.OPT_SERIALIZE_NUMPY))
+        else:
+            with open(output_file, 'w') as f:
+                json.dump(waypoint_data, f, default=_json_default)
+        logger.info(f"Waypoints saved to {output_file}")
+        
+        frame = pd.concat([water_frame, store_frame], ignore_index=True)
+        self._index_waypoints(gpd.GeoDataFrame(
+            frame.drop(columns=['longitude', 'latitude']),
+            geometry=gpd.points_from_xy(frame['longitude'], frame['latitude']),
+            crs='EPSG:4326'
+        ))
+        return water_frame, store_frame
+    
     def save_waypoints(self, water_waypoints: List[Dict], store_waypoints: List[Dict], 
-                      output_file: str = 'waypoints_data.json') -> None:
+                      output_file: str = 'waypoints_data.json', parquet_file: Optional[str] = None) -> None:
         """
         Save waypoints to JSON file.
         
@@ -312,29 +830,47 @@ class WaypointManager:
             water_waypoints: List of water fountain waypoints
             store_waypoints: List of store waypoints
             output_file: Output file path
+            parquet_file: Optional path for a zstd-compressed GeoParquet copy of the
+                waypoints (needs pyarrow); the JSON file keeps the metadata
         """
-        all_waypoints = water_waypoints + store_waypoints
-        
         waypoint_data = {
-            'metadata': {
-                'total_waypoints': len(all_waypoints),
-                'water_fountains': len(water_waypoints),
-                'stores': len(store_waypoints),
-                'bounding_box': {
-                    'north': self.bbox[0],
-                    'south': self.bbox[1],
-                    'east': self.bbox[2],
-                    'west': self.bbox[3]
-                },
-                'area_km2': (self.bbox[0] - self.bbox[1]) * (self.bbox[2] - self.bbox[3]) * 111 * 111
-            },
-            'waypoints': all_waypoints
+            'metadata': self._metadata(len(water_waypoints), len(store_waypoints)),
+            # Kept as two lists (the layout of waypoint_data.json) so the combined list is never built
+            'water_fountains': water_waypoints,
+            'stores': store_waypoints
         }
         
-        with open(output_file, 'w') as f:
-            json.dump(waypoint_data, f, indent=2)
+        if ORJSON_AVAILABLE:
+            with open(output_file, 'wb') as f:
+                f.write(orjson.dumps(waypoint_data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+        else:
+            with open(output_file, 'w') as f:
+                json.dump(waypoint_data, f, indent=2)
         
         logger.info(f"Waypoints saved to {output_file}")
+        
+        if parquet_file:
+            if not PYARROW_AVAILABLE:
+                logger.warning(f"pyarrow not available - skipping {parquet_file}")
+                return
+            waypoint_gdf = self._waypoints_gdf(water_waypoints, store_waypoints)
+            waypoint_gdf.to_parquet(parquet_file, compression='zstd')
+            logger.info(f"Waypoints saved to {parquet_file}")
+    
+    @staticmethod
+    def load_waypoints_parquet(parquet_file: str) -> Tuple[gpd.GeoDataFrame, gpd.GeoDataFrame]:
+        """
+        Load waypoints saved with save_waypoints(parquet_file=...).
+        
+        Args:
+            parquet_file: GeoParquet file path
+            
+        Returns:
+            Tuple of (water_gdf, store_gdf)
+        """
+        waypoint_gdf = gpd.read_parquet(parquet_file)
+        is_water = waypoint_gdf['type'] == 'water'
+        return waypoint_gdf[is_water], waypoint_gdf[~is_water]
     
     def create_visualization(self, water_waypoints: List[Dict], store_waypoints: List[Dict], 
                            output_file: str = 'waypoints_map.html') -> folium.Map:
@@ -350,6 +886,18 @@ class WaypointManager:
             Folium map object
         """
         return self.visualizer.create_map(water_waypoints, store_waypoints, output_file)
+    
+    def export_visualization(self, water_waypoints: List[Dict], store_waypoints: List[Dict], 
+                             output_file: str = 'waypoints_map.html') -> None:
+        """
+        Save the waypoint map as a standalone Leaflet page (no folium map object).
+        
+        Args:
+            water_waypoints: List of water fountain waypoints
+            store_waypoints: List of store waypoints
+            output_file: Output file path for the map
+        """
+        self.visualizer.export_map(water_waypoints, store_waypoints, output_file)
 
 
 def main():
@@ -366,7 +914,7 @@ def main():
     manager.save_waypoints(water_waypoints, store_waypoints)
     
     # Create visualization
-    manager.create_visualization(water_waypoints, store_waypoints)
+    manager.export_visualization(water_waypoints, store_waypoints)
     
     logger.info("Waypoint pathfinding system completed successfully!")
     
@@ -175,7 +175,15 @@ export default function EdgeAnalysis({ onBack }: { onBack?: () => void }) {
         return;
       }
       
-      setEdges(data.edges);
+      // Backend sends flat [lon1, lat1, lon2, lat2] rows; rebuild edge objects
+      const flat: number[][] = data.edges_flat;
+      const weights: number[] = data.weights;
+      setEdges(flat.map(([lng1, lat1, lng2, lat2], i) => ({
+        id: `edge_${i}`,
+        a: { lat: lat1, lng: lng1 },
+        b: { lat: lat2, lng: lng2 },
+        weight: weights[i],
+      })));
       console.log(`Loaded ${data.count} edges (${data.total_available} total available)`);
       
       if (data.limited) {